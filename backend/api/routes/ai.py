@@ -1,28 +1,45 @@
 """AI-related API endpoints for LLM status and chat."""
 
+import asyncio
 import os
 import time
 from datetime import datetime, timezone
-from typing import Optional
-from fastapi import APIRouter, HTTPException
+from typing import Dict, Optional
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, field_validator
 
-from llm.client import LLMClient
-from llm.prompts import SUMMARY_TEMPLATE
+from core.cache import TTLCache
+from llm.coalescing import CoalescingLLMProxy
+from llm.cache import cached_generate
+from llm.client import get_llm_client
+from llm.prompts import ANALYSIS_SYSTEM_PROMPT, ANALYSIS_RECORD_LINE, ANALYSIS_TEMPLATES
 
 
 router = APIRouter()
 
-# Global LLM client instance
-_llm_client: Optional[LLMClient] = None
+# Redis TTLs for cached responses; analyses change only when a document is re-ingested
+CHAT_CACHE_TTL = 60 * 60
+ANALYZE_CACHE_TTL = 4 * 60 * 60
 
+# Seconds a status probe result is reused, so polling clients don't each hit HF
+AI_STATUS_CACHE_TTL = float(os.getenv("AI_STATUS_CACHE_TTL", "10"))
 
-def get_llm_client() -> LLMClient:
-    """Get or create LLM client singleton."""
-    global _llm_client
-    if _llm_client is None:
-        _llm_client = LLMClient()
-    return _llm_client
+# Bound once so per-record formatting skips the attribute lookup
+_format_record_line = ANALYSIS_RECORD_LINE.format
+
+_llm_coalescer: Optional[CoalescingLLMProxy] = None
+
+_status_cache = TTLCache(maxsize=1, ttl=AI_STATUS_CACHE_TTL)
+_status_lock = asyncio.Lock()
+
+
+def get_llm_coalescer() -> CoalescingLLMProxy:
+    """Get or create the chat request coalescer wrapping the LLM client singleton."""
+    global _llm_coalescer
+    if _llm_coalescer is None:
+        _llm_coalescer = CoalescingLLMProxy(get_llm_client())
+    return _llm_coalescer
 
 
 # Request/Response Models
@@ -94,6 +111,18 @@ class AIAnalyzeResponse(BaseModel):
     processing_time_ms: float
 
 
+class AIAnalyzeAllRequest(BaseModel):
+    """Request for every analysis type of a document at once."""
+    document_id: str
+
+
+class AIAnalyzeAllResponse(BaseModel):
+    """Response with one analysis per analysis type."""
+    document_id: str
+    analyses: Dict[str, str]
+    processing_time_ms: float
+
+
 @router.get("/ai/status", response_model=AIStatusResponse)
 async def get_ai_status():
     """
@@ -104,7 +133,24 @@ async def get_ai_status():
     - Model name
     - Whether HF token is configured
     - Response time for last health check
+    
+    Results are cached for AI_STATUS_CACHE_TTL seconds.
     """
+    cached = _status_cache.get("status")
+    if cached is not None:
+        return cached
+    
+    # Only one probe at a time; waiters reuse its result
+    async with _status_lock:
+        cached = _status_cache.get("status")
+        if cached is None:
+            cached = await _probe_ai_status()
+            _status_cache.set("status", cached)
+    return cached
+
+
+async def _probe_ai_status() -> AIStatusResponse:
+    """Run a live health check against the LLM service."""
     client = get_llm_client()
     has_token = bool(os.getenv("HF_TOKEN"))
     
@@ -112,7 +158,7 @@ async def get_ai_status():
     start_time = time.time()
     
     try:
-        is_available = client.is_available()
+        is_available = await client.is_available()
         response_time_ms = (time.time() - start_time) * 1000
         
         if is_available:
@@ -146,13 +192,14 @@ async def get_ai_status():
 
 
 @router.post("/ai/chat", response_model=AIChatResponse)
-async def ai_chat(request: AIChatRequest):
+async def ai_chat(request: AIChatRequest, response: Response):
     """
     Send a message to the AI assistant.
     
     Supports optional document context for document-aware responses.
+    Identical concurrent requests share one generation call.
     """
-    client = get_llm_client()
+    client = get_llm_coalescer()
     
     start_time = time.time()
     
@@ -170,23 +217,27 @@ Be concise, professional, and helpful. Focus on actionable information."""
         system_prompt += "\nContext: You are assisting with maritime maintenance documentation for military vessels."
     
     try:
-        response = await client.generate(
+        reply, cache_hit = await cached_generate(
+            client,
             prompt=request.message,
             system_prompt=system_prompt,
+            namespace="chat",
+            ttl=CHAT_CACHE_TTL,
             max_tokens=1024,
             temperature=0.3
         )
+        response.headers["X-Cache"] = "HIT" if cache_hit else "MISS"
         
         processing_time_ms = (time.time() - start_time) * 1000
         
-        if not response:
+        if not reply:
             raise HTTPException(
                 status_code=503,
                 detail="AI model did not return a response. The service may be temporarily unavailable."
             )
         
         return AIChatResponse(
-            response=response,
+            response=reply,
             tokens_used=None,  # HF API doesn't always return this
             processing_time_ms=round(processing_time_ms, 2)
         )
@@ -200,106 +251,82 @@ Be concise, professional, and helpful. Focus on actionable information."""
         )
 
 
-@router.post("/ai/analyze", response_model=AIAnalyzeResponse)
-async def ai_analyze(request: AIAnalyzeRequest):
-    """
-    Perform AI analysis on a document.
-    
-    Analysis types:
-    - summary: Generate a summary of the document
-    - risks: Identify potential risks and issues
-    - priorities: Highlight priority items
-    """
+def _load_analysis_context(document_id: str):
+    """Fetch a document's filename and format its records for prompting (blocking)."""
     from db.database import SessionLocal
     from models.models import Document, ExtractedRecord
     
-    client = get_llm_client()
-    start_time = time.time()
-    
-    # Fetch document and records
     db = SessionLocal()
     try:
-        document = db.query(Document).filter(Document.id == request.document_id).first()
-        if not document:
+        filename = db.query(Document.filename).filter(Document.id == document_id).scalar()
+        if filename is None:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        records = db.query(ExtractedRecord).filter(
-            ExtractedRecord.document_id == request.document_id
-        ).all()
+        # Only the prompted columns, as plain rows rather than ORM objects
+        rows = db.query(
+            ExtractedRecord.component,
+            ExtractedRecord.priority,
+            ExtractedRecord.maint_action,
+            ExtractedRecord.status
+        ).filter(ExtractedRecord.document_id == document_id).all()
         
         # Build context from records
-        record_context = []
-        for r in records:
-            record_context.append(
-                f"- Component: {r.component or 'N/A'}, "
-                f"Priority: {r.priority or 'N/A'}, "
-                f"Action: {r.maint_action or 'N/A'}, "
-                f"Status: {r.status or 'N/A'}"
+        record_context = [
+            _format_record_line(
+                component=component or "N/A",
+                priority=priority or "N/A",
+                action=maint_action or "N/A",
+                status=status or "N/A"
             )
+            for component, priority, maint_action, status in rows
+        ]
         
         records_text = "\n".join(record_context) if record_context else "No records extracted."
-        
+        return filename, records_text
     finally:
         db.close()
-    
-    # Build analysis prompt based on type
-    if request.analysis_type == "summary":
-        prompt = f"""Summarize the following maintenance document and its records:
-
-Document: {document.filename}
-Records:
-{records_text}
 
-Provide a brief executive summary (3-5 sentences) covering:
-1. Total maintenance items
-2. Priority distribution
-3. Key concerns or patterns"""
 
-    elif request.analysis_type == "risks":
-        prompt = f"""Analyze the following maintenance records for potential risks:
-
-Document: {document.filename}
-Records:
-{records_text}
-
-Identify:
-1. High-priority items requiring immediate attention
-2. Potential equipment failure risks
-3. Resource or scheduling concerns
-4. Recommended preventive actions"""
-
-    elif request.analysis_type == "priorities":
-        prompt = f"""Prioritize the following maintenance items:
-
-Document: {document.filename}
-Records:
-{records_text}
-
-Provide a prioritized action list:
-1. Rank items by urgency
-2. Explain prioritization rationale
-3. Suggest optimal sequencing"""
-
-    else:
+@router.post("/ai/analyze", response_model=AIAnalyzeResponse)
+async def ai_analyze(request: AIAnalyzeRequest, response: Response):
+    """
+    Perform AI analysis on a document.
+    
+    Analysis types:
+    - summary: Generate a summary of the document
+    - risks: Identify potential risks and issues
+    - priorities: Highlight priority items
+    """
+    client = get_llm_client()
+    start_time = time.time()
+    
+    template = ANALYSIS_TEMPLATES.get(request.analysis_type)
+    if template is None:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid analysis_type: {request.analysis_type}. "
                    f"Must be 'summary', 'risks', or 'priorities'."
         )
     
+    # Fetch document and records
+    filename, records_text = await run_in_threadpool(_load_analysis_context, request.document_id)
+    prompt = template.format(filename=filename, records=records_text)
+    
     try:
-        system_prompt = "You are a maintenance document analyst. Provide clear, actionable analysis."
-        
-        response = await client.generate(
+        analysis, cache_hit = await cached_generate(
+            client,
             prompt=prompt,
-            system_prompt=system_prompt,
+            system_prompt=ANALYSIS_SYSTEM_PROMPT,
+            namespace=f"analyze:{request.document_id}",
+            ttl=ANALYZE_CACHE_TTL,
             max_tokens=1024,
             temperature=0.2
         )
+        response.headers["X-Cache"] = "HIT" if cache_hit else "MISS"
         
         processing_time_ms = (time.time() - start_time) * 1000
         
-        if not response:
+        if not analysis:
             raise HTTPException(
                 status_code=503,
                 detail="AI analysis failed. The service may be temporarily unavailable."
@@ -308,7 +335,63 @@ Provide a prioritized action list:
         return AIAnalyzeResponse(
             document_id=request.document_id,
             analysis_type=request.analysis_type,
-            analysis=response,
+            analysis=analysis,
+            processing_time_ms=round(processing_time_ms, 2)
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"AI analysis error: {str(e)}"
+        )
+
+
+@router.post("/ai/analyze_all", response_model=AIAnalyzeAllResponse)
+async def ai_analyze_all(request: AIAnalyzeAllRequest, response: Response):
+    """
+    Run summary, risks, and priorities analysis on a document concurrently.
+    
+    The document is loaded once and the three generations run in parallel,
+    sharing cache entries with /ai/analyze.
+    """
+    client = get_llm_client()
+    start_time = time.time()
+    
+    # Fetch document and records once for all analyses
+    filename, records_text = await run_in_threadpool(_load_analysis_context, request.document_id)
+    
+    try:
+        results = await asyncio.gather(*[
+            cached_generate(
+                client,
+                prompt=template.format(filename=filename, records=records_text),
+                system_prompt=ANALYSIS_SYSTEM_PROMPT,
+                namespace=f"analyze:{request.document_id}",
+                ttl=ANALYZE_CACHE_TTL,
+                max_tokens=1024,
+                temperature=0.2
+            )
+            for template in ANALYSIS_TEMPLATES.values()
+        ])
+        response.headers["X-Cache"] = "HIT" if all(hit for _, hit in results) else "MISS"
+        
+        processing_time_ms = (time.time() - start_time) * 1000
+        
+        analyses = {
+            analysis_type: analysis
+            for analysis_type, (analysis, _) in zip(ANALYSIS_TEMPLATES, results)
+        }
+        if not all(analyses.values()):
+            raise HTTPException(
+                status_code=503,
+                detail="AI analysis failed. The service may be temporarily unavailable."
+            )
+        
+        return AIAnalyzeAllResponse(
+            document_id=request.document_id,
+            analyses=analyses,
             processing_time_ms=round(processing_time_ms, 2)
         )
         
@@ -3,18 +3,41 @@
 from typing import List, Optional
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
 
 from db.database import get_db
 from models.models import Document, ExtractedRecord, Anomaly
-from models.schemas import DocumentResponse, DocumentDetail, RecordResponse
+from models.schemas import DocumentResponse, DocumentDetail, RecordResponse, DeleteResponse
 
 router = APIRouter()
 
+# Validates a whole page of ORM rows in one pydantic-core call
+_records_adapter = TypeAdapter(List[RecordResponse])
+
+
+def _with_counts(db: Session):
+    """
+    Query documents alongside their record and anomaly counts.
+    
+    Counts are correlated subqueries, so each returned document costs an
+    index lookup on document_id rather than the whole page aggregating
+    every record and anomaly in the database.
+    """
+    record_count = select(func.count()).where(
+        ExtractedRecord.document_id == Document.id
+    ).correlate(Document).scalar_subquery()
+    
+    anomaly_count = select(func.count()).where(
+        Anomaly.document_id == Document.id
+    ).correlate(Document).scalar_subquery()
+    
+    return db.query(Document, record_count, anomaly_count)
+
 
 @router.get("/documents", response_model=List[DocumentResponse])
-async def list_documents(
+def list_documents(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     processed: Optional[bool] = None,
@@ -25,23 +48,15 @@ async def list_documents(
     
     Supports pagination and filtering by processed status.
     """
-    query = db.query(Document)
+    query = _with_counts(db)
     
     if processed is not None:
         query = query.filter(Document.processed == processed)
     
-    documents = query.order_by(Document.upload_date.desc()).offset(skip).limit(limit).all()
-    
-    result = []
-    for doc in documents:
-        record_count = db.query(func.count(ExtractedRecord.id)).filter(
-            ExtractedRecord.document_id == doc.id
-        ).scalar()
-        anomaly_count = db.query(func.count(Anomaly.id)).filter(
-            Anomaly.document_id == doc.id
-        ).scalar()
-        
-        result.append(DocumentResponse(
+    rows = query.order_by(Document.upload_date.desc()).offset(skip).limit(limit).all()
+    
+    return [
+        DocumentResponse(
             id=doc.id,
             filename=doc.filename,
             file_type=doc.file_type,
@@ -51,13 +66,13 @@ async def list_documents(
             processing_status=doc.processing_status,
             record_count=record_count,
             anomaly_count=anomaly_count
-        ))
-    
-    return result
+        )
+        for doc, record_count, anomaly_count in rows
+    ]
 
 
-@router.delete("/documents/{document_id}")
-async def delete_document(
+@router.delete("/documents/{document_id}", response_model=DeleteResponse)
+def delete_document(
     document_id: UUID,
     db: Session = Depends(get_db)
 ):
@@ -94,22 +109,17 @@ async def delete_document(
 
 
 @router.get("/documents/{document_id}", response_model=DocumentDetail)
-async def get_document(
+def get_document(
     document_id: UUID,
     db: Session = Depends(get_db)
 ):
     """Get detailed information about a specific document."""
-    document = db.query(Document).filter(Document.id == document_id).first()
+    row = _with_counts(db).filter(Document.id == document_id).first()
     
-    if not document:
+    if not row:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    record_count = db.query(func.count(ExtractedRecord.id)).filter(
-        ExtractedRecord.document_id == document.id
-    ).scalar()
-    anomaly_count = db.query(func.count(Anomaly.id)).filter(
-        Anomaly.document_id == document.id
-    ).scalar()
+    document, record_count, anomaly_count = row
     
     return DocumentDetail(
         id=document.id,
@@ -126,7 +136,7 @@ async def get_document(
 
 
 @router.get("/records", response_model=List[RecordResponse])
-async def list_records(
+def list_records(
     document_id: Optional[UUID] = None,
     status: Optional[str] = None,
     priority: Optional[str] = None,
@@ -148,11 +158,11 @@ async def list_records(
     
     records = query.order_by(ExtractedRecord.created_at.desc()).offset(skip).limit(limit).all()
     
-    return [RecordResponse.model_validate(record) for record in records]
+    return _records_adapter.validate_python(records, from_attributes=True)
 
 
 @router.get("/record/{record_id}", response_model=RecordResponse)
-async def get_record(
+def get_record(
     record_id: UUID,
     db: Session = Depends(get_db)
 ):
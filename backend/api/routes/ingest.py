@@ -6,14 +6,15 @@ from sqlalchemy.orm import Session
 
 from db.database import get_db
 from models.models import Document
-from models.schemas import DocumentResponse
-from services.pipeline import IngestionPipeline
+from models.schemas import IngestResponse
+from core.celery_app import CELERY_BROKER_URL
+from services.tasks import run_ingest, run_ingestion_pipeline
 
 router = APIRouter()
 
 
-@router.post("/ingest/{document_id}")
-async def ingest_document(
+@router.post("/ingest/{document_id}", response_model=IngestResponse, status_code=202)
+def ingest_document(
     document_id: UUID,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
@@ -36,8 +37,11 @@ async def ingest_document(
     document.processing_status = "processing"
     db.commit()
     
-    # Run pipeline in background
-    background_tasks.add_task(run_ingestion_pipeline, document_id)
+    # Hand off to the worker queue when one is configured, else run in-process
+    if CELERY_BROKER_URL:
+        run_ingest.delay(str(document_id))
+    else:
+        background_tasks.add_task(run_ingestion_pipeline, document_id)
     
     return {
         "message": "Ingestion started",
@@ -45,20 +49,3 @@ async def ingest_document(
         "status": "processing"
     }
 
-
-async def run_ingestion_pipeline(document_id: UUID):
-    """Background task to run the ingestion pipeline."""
-    from db.database import SessionLocal
-    
-    db = SessionLocal()
-    try:
-        pipeline = IngestionPipeline(db)
-        await pipeline.process_document(document_id)
-    except Exception as e:
-        # Update document status on error
-        document = db.query(Document).filter(Document.id == document_id).first()
-        if document:
-            document.processing_status = f"error: {str(e)[:100]}"
-            db.commit()
-    finally:
-        db.close()
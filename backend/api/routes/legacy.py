@@ -1,17 +1,40 @@
-"""Legacy Excel conversion endpoint."""
+"""Legacy Excel conversion endpoints."""
 
+import os
+import uuid
+from uuid import UUID
+import aiofiles
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-import uuid
 
 from db.database import get_db
-from models.schemas import LegacyConversionResult
+from core.celery_app import CELERY_BROKER_URL
+from models.models import Document
+from models.schemas import LegacyConversionResult, LegacyConversionPending
 from ingestion.legacy_converter import LegacyConverter
+from services.tasks import convert_legacy
+from api.routes.upload import UPLOAD_DIR, MAX_FILE_SIZE, UPLOAD_CHUNK_SIZE
 
 router = APIRouter()
 
 
-@router.post("/legacy/convert", response_model=LegacyConversionResult)
+def _pending_response(document_id: UUID) -> JSONResponse:
+    """202 response pointing the client at the result endpoint."""
+    pending = LegacyConversionPending(
+        document_id=document_id,
+        status="converting",
+        result_url=f"/legacy/result/{document_id}"
+    )
+    return JSONResponse(status_code=202, content=pending.model_dump(mode="json"))
+
+
+@router.post(
+    "/legacy/convert",
+    response_model=LegacyConversionResult,
+    responses={202: {"model": LegacyConversionPending}}
+)
 async def convert_legacy_excel(
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
@@ -23,7 +46,8 @@ async def convert_legacy_excel(
     - component, system, priority, maint_action
     - cost_estimate, start_date, end_date, notes
     
-    Returns normalized records and ingestion summary.
+    With a worker queue configured, returns 202 and a result URL to poll;
+    otherwise converts in a worker thread and returns the summary directly.
     """
     # Validate file type
     if not file.filename.endswith(('.xlsx', '.xls')):
@@ -32,19 +56,81 @@ async def convert_legacy_excel(
             detail="Only Excel files (.xlsx, .xls) are supported"
         )
     
+    document_id = uuid.uuid4()
+    file_path = os.path.join(UPLOAD_DIR, f"{document_id}{os.path.splitext(file.filename)[1].lower()}")
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    
+    # Stream to disk in chunks, enforcing the size limit as we go
+    file_size = 0
+    async with aiofiles.open(file_path, 'wb') as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            file_size += len(chunk)
+            if file_size > MAX_FILE_SIZE:
+                break
+            await f.write(chunk)
+    
+    if file_size > MAX_FILE_SIZE:
+        os.remove(file_path)
+        raise HTTPException(
+            status_code=400,
+            detail=f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
+        )
+    
+    # Placeholder document the conversion fills in
+    document = Document(
+        id=document_id,
+        filename=file.filename,
+        file_type="legacy_excel",
+        file_size=file_size,
+        processing_status="converting"
+    )
+    db.add(document)
+    await run_in_threadpool(db.commit)
+    
+    if CELERY_BROKER_URL:
+        convert_legacy.delay(str(document_id), file_path)
+        return _pending_response(document_id)
+    
     try:
-        content = await file.read()
-        
         converter = LegacyConverter(db)
-        result = await converter.convert(
-            file_content=content,
-            filename=file.filename
-        )
-        
-        return result
+        return await run_in_threadpool(converter.convert, document_id, file_path)
         
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Conversion failed: {str(e)}"
         )
+
+
+@router.get(
+    "/legacy/result/{document_id}",
+    response_model=LegacyConversionResult,
+    responses={202: {"model": LegacyConversionPending}}
+)
+def get_legacy_result(
+    document_id: UUID,
+    db: Session = Depends(get_db)
+):
+    """
+    Get the outcome of a legacy conversion.
+    
+    Returns 202 while the conversion is still running.
+    """
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.file_type == "legacy_excel"
+    ).first()
+    
+    if not document:
+        raise HTTPException(status_code=404, detail="Legacy conversion not found")
+    
+    if document.processing_status == "converting":
+        return _pending_response(document_id)
+    
+    if document.processing_status != "converted":
+        raise HTTPException(
+            status_code=500,
+            detail=f"Conversion failed: {document.processing_status}"
+        )
+    
+    return LegacyConverter(db).get_result(document)
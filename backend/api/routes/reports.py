@@ -1,21 +1,25 @@
 """Report generation endpoints."""
 
 from datetime import datetime
+from typing import List
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import case, func
 
 from db.database import get_db
 from models.models import Document, ExtractedRecord, Anomaly
-from models.schemas import SummaryReport, CAPReport
-from reports.cap_generator import CAPGenerator
+from models.schemas import SummaryReport, CAPReport, CAPBatchRequest
+from llm.client import LLMClient, get_llm_client
+from reports.cap_generator import CAPGenerator, CAP_RECORD_COLUMNS
 
 router = APIRouter()
 
 
 @router.get("/report/summary", response_model=SummaryReport)
-async def get_summary_report(
+def get_summary_report(
     document_id: UUID,
     db: Session = Depends(get_db)
 ):
@@ -30,57 +34,72 @@ async def get_summary_report(
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    records = db.query(ExtractedRecord).filter(
-        ExtractedRecord.document_id == document_id
-    ).all()
+    record_filter = ExtractedRecord.document_id == document_id
     
     # Status breakdown
-    status_breakdown = {}
-    for record in records:
-        status = record.status or "unknown"
-        status_breakdown[status] = status_breakdown.get(status, 0) + 1
+    status_breakdown = {
+        status or "unknown": count
+        for status, count in db.query(
+            ExtractedRecord.status, func.count(ExtractedRecord.id)
+        ).filter(record_filter).group_by(ExtractedRecord.status)
+    }
     
     # Priority breakdown
-    priority_breakdown = {}
-    for record in records:
-        priority = record.priority or "unassigned"
-        priority_breakdown[priority] = priority_breakdown.get(priority, 0) + 1
-    
-    # Total cost estimate
-    total_cost = sum(
-        float(r.cost_estimate) for r in records 
-        if r.cost_estimate is not None
-    )
+    priority_breakdown = {
+        priority or "unassigned": count
+        for priority, count in db.query(
+            ExtractedRecord.priority, func.count(ExtractedRecord.id)
+        ).filter(record_filter).group_by(ExtractedRecord.priority)
+    }
     
-    # Date range
-    dates = [r.start_date for r in records if r.start_date] + \
-            [r.end_date for r in records if r.end_date]
+    # Record totals, cost estimate and date bounds
+    (
+        total_records, cost_sum,
+        min_start, min_end, max_start, max_end
+    ) = db.query(
+        func.count(ExtractedRecord.id),
+        func.sum(ExtractedRecord.cost_estimate),
+        func.min(ExtractedRecord.start_date),
+        func.min(ExtractedRecord.end_date),
+        func.max(ExtractedRecord.start_date),
+        func.max(ExtractedRecord.end_date)
+    ).filter(record_filter).one()
+    
+    total_cost = float(cost_sum or 0)
+    
+    # Date range across both start and end dates
+    earliest = [d for d in (min_start, min_end) if d]
+    latest = [d for d in (max_start, max_end) if d]
     date_range = None
-    if dates:
+    if earliest:
         date_range = {
-            "earliest": str(min(dates)),
-            "latest": str(max(dates))
+            "earliest": str(min(earliest)),
+            "latest": str(max(latest))
         }
     
     # Anomaly summary
-    anomalies = db.query(Anomaly).filter(
-        Anomaly.document_id == document_id
-    ).all()
+    anomaly_filter = Anomaly.document_id == document_id
+    anomaly_total, anomaly_resolved = db.query(
+        func.count(Anomaly.id),
+        func.coalesce(func.sum(case((Anomaly.resolved.is_(True), 1), else_=0)), 0)
+    ).filter(anomaly_filter).one()
     
     anomaly_summary = {
-        "total": len(anomalies),
-        "resolved": sum(1 for a in anomalies if a.resolved),
-        "unresolved": sum(1 for a in anomalies if not a.resolved),
-        "by_type": {}
+        "total": anomaly_total,
+        "resolved": anomaly_resolved,
+        "unresolved": anomaly_total - anomaly_resolved,
+        "by_type": {
+            atype: count
+            for atype, count in db.query(
+                Anomaly.anomaly_type, func.count(Anomaly.id)
+            ).filter(anomaly_filter).group_by(Anomaly.anomaly_type)
+        }
     }
-    for anomaly in anomalies:
-        atype = anomaly.anomaly_type
-        anomaly_summary["by_type"][atype] = anomaly_summary["by_type"].get(atype, 0) + 1
     
     return SummaryReport(
         document_id=document.id,
         filename=document.filename,
-        total_records=len(records),
+        total_records=total_records,
         status_breakdown=status_breakdown,
         priority_breakdown=priority_breakdown,
         total_cost_estimate=total_cost if total_cost > 0 else None,
@@ -90,10 +109,40 @@ async def get_summary_report(
     )
 
 
+def _load_document_records(db: Session, document_id: UUID):
+    """Fetch a document and its records (blocking; run off the event loop)."""
+    document = db.query(Document).filter(Document.id == document_id).first()
+    if not document:
+        return None, []
+    
+    # Only the columns the CAP reads, as plain rows
+    records = db.query(*CAP_RECORD_COLUMNS).filter(
+        ExtractedRecord.document_id == document_id
+    ).all()
+    return document, records
+
+
+def _load_documents_records(db: Session, document_ids: List[UUID]):
+    """Fetch several documents and their records, grouped by document id (blocking)."""
+    documents = {
+        document.id: document
+        for document in db.query(Document).filter(Document.id.in_(document_ids))
+    }
+    
+    records = {}
+    rows = db.query(ExtractedRecord.document_id, *CAP_RECORD_COLUMNS).filter(
+        ExtractedRecord.document_id.in_(document_ids)
+    )
+    for row in rows:
+        records.setdefault(row.document_id, []).append(row)
+    return documents, records
+
+
 @router.get("/report/cap", response_model=CAPReport)
 async def generate_cap_report(
     document_id: UUID,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    llm_client: LLMClient = Depends(get_llm_client)
 ):
     """
     Generate a Corrective Action Plan (CAP) for a document.
@@ -101,22 +150,18 @@ async def generate_cap_report(
     Uses LLM to create a structured engineering document
     with findings, recommendations, and action items.
     """
-    document = db.query(Document).filter(Document.id == document_id).first()
+    document, records = await run_in_threadpool(_load_document_records, db, document_id)
     
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    records = db.query(ExtractedRecord).filter(
-        ExtractedRecord.document_id == document_id
-    ).all()
-    
     if not records:
         raise HTTPException(
             status_code=400,
             detail="No records found for this document. Please process the document first."
         )
     
-    generator = CAPGenerator()
+    generator = CAPGenerator(llm_client)
     markdown_content = await generator.generate(document, records)
     
     return CAPReport(
@@ -124,3 +169,71 @@ async def generate_cap_report(
         generated_at=datetime.utcnow(),
         markdown_content=markdown_content
     )
+
+
+@router.get("/report/cap/stream")
+async def stream_cap_report(
+    document_id: UUID,
+    db: Session = Depends(get_db),
+    llm_client: LLMClient = Depends(get_llm_client)
+):
+    """
+    Stream a Corrective Action Plan for a document as Markdown.
+    
+    Same content as /report/cap, sent as the LLM generates it so the
+    first section arrives without waiting for the whole plan.
+    """
+    document, records = await run_in_threadpool(_load_document_records, db, document_id)
+    
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    if not records:
+        raise HTTPException(
+            status_code=400,
+            detail="No records found for this document. Please process the document first."
+        )
+    
+    generator = CAPGenerator(llm_client)
+    return StreamingResponse(
+        generator.generate_stream(document, records),
+        media_type="text/markdown"
+    )
+
+
+@router.post("/report/cap/batch", response_model=List[CAPReport])
+async def generate_cap_reports(
+    request: CAPBatchRequest,
+    db: Session = Depends(get_db),
+    llm_client: LLMClient = Depends(get_llm_client)
+):
+    """
+    Generate Corrective Action Plans for several documents in one call.
+    
+    Intended for bulk runs such as regenerating every plan overnight:
+    records for all documents are loaded in one query and the plans are
+    generated concurrently.
+    """
+    document_ids = list(dict.fromkeys(request.document_ids))
+    documents, records = await run_in_threadpool(_load_documents_records, db, document_ids)
+    
+    missing = [str(i) for i in document_ids if i not in documents]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Documents not found: {', '.join(missing)}")
+    
+    unprocessed = [str(i) for i in document_ids if i not in records]
+    if unprocessed:
+        raise HTTPException(
+            status_code=400,
+            detail=f"No records found for documents: {', '.join(unprocessed)}. "
+                   "Please process them first."
+        )
+    
+    generator = CAPGenerator(llm_client)
+    plans = await generator.generate_batch([(documents[i], records[i]) for i in document_ids])
+    
+    generated_at = datetime.utcnow()
+    return [
+        CAPReport(document_id=i, generated_at=generated_at, markdown_content=plans[i])
+        for i in document_ids
+    ]
@@ -2,9 +2,10 @@
 
 from typing import List
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import String, func, literal
 
 from db.database import get_db
 from models.models import ExtractedRecord, StatusUpdate
@@ -17,9 +18,12 @@ router = APIRouter()
 
 VALID_STATUSES = {"open", "in-progress", "awaiting-parts", "complete"}
 
+# Validates a whole page of ORM rows in one pydantic-core call
+_history_adapter = TypeAdapter(List[StatusUpdateResponse])
+
 
 @router.patch("/record/{record_id}/status", response_model=RecordResponse)
-async def update_record_status(
+def update_record_status(
     record_id: UUID,
     status_update: StatusUpdateRequest,
     db: Session = Depends(get_db)
@@ -55,14 +59,17 @@ async def update_record_status(
     if status_update.assigned_to:
         record.assigned_to = status_update.assigned_to
     
+    # Keep the committed values loaded; only updated_at needs re-reading, since
+    # the PostgreSQL trigger overwrites the value set here
+    db.expire_on_commit = False
     db.commit()
-    db.refresh(record)
+    db.refresh(record, attribute_names=["updated_at"])
     
     return RecordResponse.model_validate(record)
 
 
 @router.get("/status/overview", response_model=StatusOverview)
-async def get_status_overview(
+def get_status_overview(
     db: Session = Depends(get_db)
 ):
     """
@@ -70,29 +77,33 @@ async def get_status_overview(
     
     Returns counts by status and priority.
     """
-    total = db.query(func.count(ExtractedRecord.id)).scalar()
-    
-    # Count by status
-    status_counts = db.query(
-        ExtractedRecord.status,
-        func.count(ExtractedRecord.id)
-    ).group_by(ExtractedRecord.status).all()
-    
-    by_status = [
-        StatusCount(status=s or "unknown", count=c) 
-        for s, c in status_counts
-    ]
-    
-    # Count by priority
-    priority_counts = db.query(
+    # Totals and both breakdowns in a single round-trip, tagged by kind
+    by_status_q = db.query(
+        literal("status").label("kind"),
+        ExtractedRecord.status.label("key"),
+        func.count(ExtractedRecord.id).label("count")
+    ).group_by(ExtractedRecord.status)
+    by_priority_q = db.query(
+        literal("priority"),
         ExtractedRecord.priority,
         func.count(ExtractedRecord.id)
-    ).group_by(ExtractedRecord.priority).all()
+    ).group_by(ExtractedRecord.priority)
+    total_q = db.query(
+        literal("total"),
+        literal(None, type_=String),
+        func.count(ExtractedRecord.id)
+    )
     
-    by_priority = [
-        StatusCount(status=p or "unassigned", count=c) 
-        for p, c in priority_counts
-    ]
+    total = 0
+    by_status = []
+    by_priority = []
+    for kind, key, count in by_status_q.union_all(by_priority_q, total_q).all():
+        if kind == "status":
+            by_status.append(StatusCount(status=key or "unknown", count=count))
+        elif kind == "priority":
+            by_priority.append(StatusCount(status=key or "unassigned", count=count))
+        else:
+            total = count
     
     return StatusOverview(
         total_records=total or 0,
@@ -102,18 +113,20 @@ async def get_status_overview(
 
 
 @router.get("/record/{record_id}/history", response_model=List[StatusUpdateResponse])
-async def get_status_history(
+def get_status_history(
     record_id: UUID,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
     db: Session = Depends(get_db)
 ):
-    """Get status change history for a record."""
-    record = db.query(ExtractedRecord).filter(ExtractedRecord.id == record_id).first()
+    """Get status change history for a record, newest first."""
+    record_exists = db.query(ExtractedRecord.id).filter(ExtractedRecord.id == record_id).first()
     
-    if not record:
+    if not record_exists:
         raise HTTPException(status_code=404, detail="Record not found")
     
     history = db.query(StatusUpdate).filter(
         StatusUpdate.record_id == record_id
-    ).order_by(StatusUpdate.created_at.desc()).all()
+    ).order_by(StatusUpdate.created_at.desc()).offset(skip).limit(limit).all()
     
-    return [StatusUpdateResponse.model_validate(h) for h in history]
+    return _history_adapter.validate_python(history, from_attributes=True)
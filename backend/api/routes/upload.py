@@ -1,13 +1,17 @@
 """File upload endpoint."""
 
+import hashlib
 import os
 import uuid
 import aiofiles
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from db.database import get_db
-from models.models import Document
+from models.models import Document, ExtractedRecord, Anomaly
 from models.schemas import DocumentResponse
 
 router = APIRouter()
@@ -15,6 +19,7 @@ router = APIRouter()
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "uploads"))
 ALLOWED_EXTENSIONS = {".pdf", ".xlsx", ".xls", ".csv", ".txt", ".log"}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
 
 
 def get_file_extension(filename: str) -> str:
@@ -22,6 +27,44 @@ def get_file_extension(filename: str) -> str:
     return os.path.splitext(filename)[1].lower()
 
 
+def _find_by_hash(db: Session, content_sha256: str):
+    """Look up an existing document with identical content (blocking)."""
+    return db.query(Document).filter(Document.content_sha256 == content_sha256).first()
+
+
+def _commit_new_document(db: Session, document: Document):
+    """
+    Persist a new document (blocking).
+    
+    Returns the existing document instead if a concurrent upload of the same
+    content committed first.
+    """
+    try:
+        db.commit()
+        return None
+    except IntegrityError:
+        db.rollback()
+        existing = _find_by_hash(db, document.content_sha256)
+        if existing is None:
+            raise
+        return existing
+
+
+def _existing_document_response(db: Session, document: Document) -> DocumentResponse:
+    """Build the upload response for a previously stored document (blocking)."""
+    record_count = db.query(func.count(ExtractedRecord.id)).filter(
+        ExtractedRecord.document_id == document.id
+    ).scalar()
+    anomaly_count = db.query(func.count(Anomaly.id)).filter(
+        Anomaly.document_id == document.id
+    ).scalar()
+    
+    response = DocumentResponse.model_validate(document)
+    response.record_count = record_count or 0
+    response.anomaly_count = anomaly_count or 0
+    return response
+
+
 @router.post("/upload", response_model=DocumentResponse)
 async def upload_file(
     file: UploadFile = File(...),
@@ -41,19 +84,10 @@ async def upload_file(
             detail=f"File type not allowed. Supported: {', '.join(ALLOWED_EXTENSIONS)}"
         )
     
-    # Read file content
-    content = await file.read()
-    file_size = len(content)
-    
-    # Validate file size
-    if file_size > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
-        )
-    
     # Check for duplicate filename
-    existing = db.query(Document).filter(Document.filename == file.filename).first()
+    existing = await run_in_threadpool(
+        db.query(Document).filter(Document.filename == file.filename).first
+    )
     if existing:
         raise HTTPException(
             status_code=409,
@@ -68,9 +102,39 @@ async def upload_file(
     # Ensure upload directory exists
     os.makedirs(UPLOAD_DIR, exist_ok=True)
     
-    # Save file
+    # Reject oversized uploads before copying anything
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
+        )
+    
+    # Stream to disk in chunks, hashing and enforcing the size limit as we go;
+    # the content has to pass through Python for the hash anyway
+    file_size = 0
+    hasher = hashlib.sha256()
     async with aiofiles.open(file_path, 'wb') as f:
-        await f.write(content)
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            file_size += len(chunk)
+            if file_size > MAX_FILE_SIZE:
+                break
+            hasher.update(chunk)
+            await f.write(chunk)
+    content_sha256 = hasher.hexdigest()
+    
+    # Validate file size
+    if file_size > MAX_FILE_SIZE:
+        os.remove(file_path)
+        raise HTTPException(
+            status_code=400,
+            detail=f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
+        )
+    
+    # Identical content was uploaded before; reuse it rather than re-running extraction
+    existing = await run_in_threadpool(_find_by_hash, db, content_sha256)
+    if existing:
+        os.remove(file_path)
+        return await run_in_threadpool(_existing_document_response, db, existing)
     
     # Determine file type category
     file_type_map = {
@@ -89,12 +153,17 @@ async def upload_file(
         filename=file.filename,
         file_type=file_type,
         file_size=file_size,
+        content_sha256=content_sha256,
         processing_status="uploaded"
     )
     
     db.add(document)
-    db.commit()
-    db.refresh(document)
+    # The response only reads values set on insert, so skip re-loading them
+    db.expire_on_commit = False
+    existing = await run_in_threadpool(_commit_new_document, db, document)
+    if existing:
+        os.remove(file_path)
+        return await run_in_threadpool(_existing_document_response, db, existing)
     
     return DocumentResponse(
         id=document.id,
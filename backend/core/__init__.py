@@ -1,5 +1,6 @@
 """Core utilities for MDIA backend."""
 
 from .logging import setup_logging, get_logger, logger
+from .cache import TTLCache
 
-__all__ = ["setup_logging", "get_logger", "logger"]
+__all__ = ["setup_logging", "get_logger", "logger", "TTLCache"]
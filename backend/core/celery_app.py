@@ -0,0 +1,27 @@
+"""Celery application for out-of-process background jobs."""
+
+import os
+
+from celery import Celery
+from celery.signals import worker_process_shutdown
+
+from core.logging import stop_logging
+
+# Ingestion is queued only when a broker is configured; otherwise the API
+# runs it in-process with FastAPI BackgroundTasks
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
+
+celery_app = Celery("mdia", broker=CELERY_BROKER_URL)
+celery_app.conf.update(
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    task_ignore_result=True,
+    imports=["services.tasks"],
+)
+
+
+@worker_process_shutdown.connect
+def _flush_logs(**kwargs):
+    """Pool children exit without running atexit hooks, so flush logs first."""
+    stop_logging()
@@ -1,20 +1,74 @@
 """Logging configuration for MDIA backend."""
 
+import atexit
+import json
 import logging
+import os
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
 
+# "json" for one JSON object per line (containers), "text" for local development
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+
+_listener: Optional[QueueListener] = None
+
+
+class JSONFormatter(logging.Formatter):
+    """Format log records as single-line JSON objects."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop this process's listener thread."""
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_listener_in_child() -> None:
+    """
+    Give a forked child its own queue and listener thread.
+    
+    fork() copies only the calling thread, so without this a child (e.g. a
+    Celery prefork worker) would enqueue records that nothing ever reads.
+    """
+    global _listener
+    if _listener is None:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    for handler in logging.getLogger("mdia").handlers:
+        if isinstance(handler, QueueHandler):
+            handler.queue = log_queue
+    _listener = QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
 
 def setup_logging(level: str = "INFO") -> logging.Logger:
     """
     Configure and return the application logger.
     
+    Log calls only enqueue the record; formatting and writing to stdout
+    happen on a background listener thread.
+    
     Args:
         level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
     
     Returns:
         Configured logger instance
     """
+    global _listener
+    
     # Create logger
     logger = logging.getLogger("mdia")
     logger.setLevel(getattr(logging, level.upper(), logging.INFO))
@@ -28,14 +82,22 @@ def setup_logging(level: str = "INFO") -> logging.Logger:
     console_handler.setLevel(logging.DEBUG)
     
     # Create formatter
-    formatter = logging.Formatter(
-        fmt="%(asctime)s | %(levelname)-8s | %(name)s:%(funcName)s:%(lineno)d - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
+    if LOG_FORMAT == "json":
+        formatter = JSONFormatter()
+    else:
+        formatter = logging.Formatter(
+            fmt="%(asctime)s | %(levelname)-8s | %(name)s:%(funcName)s:%(lineno)d - %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S"
+        )
     console_handler.setFormatter(formatter)
     
-    # Add handler to logger
-    logger.addHandler(console_handler)
+    # Hand records to the listener thread instead of writing inline
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(log_queue))
+    _listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    os.register_at_fork(after_in_child=_restart_listener_in_child)
     
     return logger
 
@@ -1,7 +1,7 @@
 """Database configuration and session management."""
 
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -14,11 +14,36 @@ DATABASE_URL = os.getenv(
 # SQLite requires special handling for check_same_thread
 connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+# Connection pool sizing for PostgreSQL; SQLite uses its own pool
+pool_args = {} if DATABASE_URL.startswith("sqlite") else {
+    "pool_size": int(os.getenv("SQLA_POOL_SIZE", "20")),
+    "max_overflow": int(os.getenv("SQLA_MAX_OVERFLOW", "40")),
+    "pool_timeout": int(os.getenv("SQLA_POOL_TIMEOUT", "10")),
+    "pool_recycle": int(os.getenv("SQLA_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": True,
+}
+
+engine = create_engine(DATABASE_URL, connect_args=connect_args, **pool_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Columns added to existing tables after their first release. create_all()
+# only creates missing tables, so databases created before a column existed
+# get it from upgrade_schema(); added columns must be nullable.
+ADDED_COLUMNS = {
+    "documents": ("content_sha256", "column_mappings"),
+}
+# Indexes declared on models after their tables' first release
+ADDED_INDEXES = (
+    "idx_records_document_created",
+    "idx_records_status",
+    "idx_records_priority",
+    "idx_records_document_status",
+    "idx_records_document_priority",
+    "idx_status_updates_record_created",
+)
+
 
 def get_db():
     """Dependency for database session."""
@@ -27,3 +52,38 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def upgrade_schema(bind=engine) -> None:
+    """
+    Add columns and indexes introduced since a table was created (idempotent).
+    
+    Columns declared unique get a unique index alongside. Run after
+    Base.metadata.create_all() with all models imported.
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    
+    with bind.begin() as conn:
+        for table_name, column_names in ADDED_COLUMNS.items():
+            if table_name not in existing_tables:
+                continue
+            present = {c["name"] for c in inspector.get_columns(table_name)}
+            table = Base.metadata.tables[table_name]
+            for name in column_names:
+                if name in present:
+                    continue
+                column = table.c[name]
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {column_type}"))
+                if column.unique:
+                    conn.execute(text(
+                        f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{table_name}_{name} "
+                        f"ON {table_name} ({name})"
+                    ))
+        
+        indexes = {index.name: index for table in Base.metadata.tables.values() for index in table.indexes}
+        for name in ADDED_INDEXES:
+            index = indexes[name]
+            if index.table.name in existing_tables:
+                index.create(conn, checkfirst=True)
@@ -2,7 +2,48 @@
 
 import pandas as pd
 from io import BytesIO
-from typing import List, Dict, Any, Optional
+from typing import Iterator, List, Dict, Any, Optional, Union
+
+# Rust-based workbook reader; much faster than openpyxl's per-cell XML parsing
+try:
+    import python_calamine  # noqa: F401
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+
+# Arrow-backed columns store strings contiguously and keep nullable ints
+# as ints, roughly halving the memory of object/float64 columns
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+_READ_KWARGS: Dict[str, Any] = {"dtype_backend": "pyarrow"} if HAS_PYARROW else {}
+
+CSV_CHUNK_SIZE = 50_000
+TEXT_PREVIEW_ROWS = 100
+
+
+def read_excel(source: Union[str, BytesIO], sheet_name: Union[str, int] = 0) -> pd.DataFrame:
+    """
+    Read a workbook sheet with the fastest available engine.
+    
+    Uses calamine when installed, otherwise streams .xlsx files through
+    openpyxl in read-only mode and leaves other inputs to pandas' default.
+    Columns are Arrow-backed when pyarrow is available.
+    """
+    if HAS_CALAMINE:
+        return pd.read_excel(source, sheet_name=sheet_name, engine="calamine", **_READ_KWARGS)
+    if isinstance(source, str) and source.endswith('.xlsx'):
+        return pd.read_excel(
+            source,
+            sheet_name=sheet_name,
+            engine="openpyxl",
+            engine_kwargs={"read_only": True, "data_only": True},
+            **_READ_KWARGS
+        )
+    return pd.read_excel(source, sheet_name=sheet_name, **_READ_KWARGS)
 
 
 class ExcelExtractor:
@@ -24,12 +65,49 @@ class ExcelExtractor:
             DataFrame with extracted data
         """
         if file_path.endswith('.csv'):
-            return pd.read_csv(file_path)
+            return pd.read_csv(file_path, **_READ_KWARGS)
         elif file_path.endswith(('.xlsx', '.xls')):
-            return pd.read_excel(file_path, sheet_name=sheet_name or 0)
+            return read_excel(file_path, sheet_name=sheet_name or 0)
         else:
             raise ValueError(f"Unsupported file format: {file_path}")
     
+    def iter_chunks(
+        self,
+        file_path: str,
+        chunksize: int = CSV_CHUNK_SIZE
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Read a CSV file lazily in chunks of at most `chunksize` rows.
+        
+        Args:
+            file_path: Path to the CSV file
+            chunksize: Number of rows per chunk
+            
+        Returns:
+            Iterator of DataFrames
+        """
+        return pd.read_csv(file_path, chunksize=chunksize, **_READ_KWARGS)
+    
+    def extract_csv_text(self, file_path: str, chunksize: int = CSV_CHUNK_SIZE) -> str:
+        """
+        Create a text representation of a CSV file without loading it whole.
+        
+        Only the preview rows are kept; later chunks are just counted.
+        """
+        preview = []
+        preview_rows = 0
+        total_rows = 0
+        with self.iter_chunks(file_path, chunksize=chunksize) as reader:
+            for chunk in reader:
+                if preview_rows < TEXT_PREVIEW_ROWS:
+                    part = chunk.head(TEXT_PREVIEW_ROWS - preview_rows)
+                    preview.append(part)
+                    preview_rows += len(part)
+                total_rows += len(chunk)
+        
+        head = pd.concat(preview) if preview else pd.read_csv(file_path, nrows=0)
+        return self.extract_text_representation(head, total_rows=total_rows)
+    
     def extract_from_bytes(
         self, 
         content: bytes, 
@@ -50,17 +128,30 @@ class ExcelExtractor:
         buffer = BytesIO(content)
         
         if file_type == 'csv':
-            return pd.read_csv(buffer)
+            return pd.read_csv(buffer, **_READ_KWARGS)
         elif file_type == 'excel':
-            return pd.read_excel(buffer, sheet_name=sheet_name or 0)
+            return read_excel(buffer, sheet_name=sheet_name or 0)
         else:
             raise ValueError(f"Unsupported file type: {file_type}")
     
+    def open(self, file_path: str) -> pd.ExcelFile:
+        """
+        Open a workbook once for reading several sheets.
+        
+        Use as a context manager; the handle's sheet_names and parse()
+        reuse the already-loaded workbook index.
+        """
+        return pd.ExcelFile(file_path, engine="calamine" if HAS_CALAMINE else None)
+    
+    def parse_sheet(self, workbook: pd.ExcelFile, sheet_name: Union[str, int] = 0) -> pd.DataFrame:
+        """Read one sheet from a workbook opened with open()."""
+        return workbook.parse(sheet_name, **_READ_KWARGS)
+    
     def get_sheet_names(self, file_path: str) -> List[str]:
         """Get list of sheet names from Excel file."""
         if file_path.endswith(('.xlsx', '.xls')):
-            xl = pd.ExcelFile(file_path)
-            return xl.sheet_names
+            with self.open(file_path) as xl:
+                return xl.sheet_names
         return []
     
     def to_records(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
@@ -73,11 +164,17 @@ class ExcelExtractor:
         Returns:
             List of row dictionaries
         """
-        # Replace NaN with None
-        df = df.where(pd.notnull(df), None)
-        return df.to_dict(orient='records')
+        records = df.to_dict(orient='records')
+        
+        # Replace NaN/NaT with None in place, touching only null cells
+        # instead of copying the whole frame to object dtype
+        nulls = df.isna()
+        for col in df.columns[nulls.any().to_numpy()]:
+            for i in nulls[col].to_numpy().nonzero()[0]:
+                records[i][col] = None
+        return records
     
-    def extract_text_representation(self, df: pd.DataFrame) -> str:
+    def extract_text_representation(self, df: pd.DataFrame, total_rows: Optional[int] = None) -> str:
         """
         Create a text representation of the DataFrame.
         
@@ -85,26 +182,37 @@ class ExcelExtractor:
         
         Args:
             df: Pandas DataFrame
+            total_rows: Row count of the full data when df holds only a preview
             
         Returns:
             Text representation of the data
         """
-        lines = []
-        lines.append(f"Columns: {', '.join(df.columns.tolist())}")
-        lines.append(f"Total rows: {len(df)}")
-        lines.append("")
+        if total_rows is None:
+            total_rows = len(df)
+        
+        lines = [
+            f"Columns: {', '.join(map(str, df.columns.tolist()))}",
+            f"Total rows: {total_rows}",
+            ""
+        ]
+        
+        # Build "col: val" fragments column by column; NaN cells become None
+        fragments = [
+            [
+                f"{col}: {val}" if present else None
+                for val, present in zip(values.tolist(), values.notna().tolist())
+            ]
+            for col, values in df.head(TEXT_PREVIEW_ROWS).items()
+        ]
         
         # Add rows as text
-        for idx, row in df.iterrows():
-            row_text = " | ".join(
-                f"{col}: {val}" for col, val in row.items() 
-                if pd.notna(val)
-            )
-            lines.append(f"Row {idx + 1}: {row_text}")
-            
-            # Limit to first 100 rows for LLM context
-            if idx >= 99:
-                lines.append(f"... and {len(df) - 100} more rows")
-                break
+        lines.extend(
+            f"Row {row_num}: {' | '.join(part for part in row_parts if part is not None)}"
+            for row_num, row_parts in enumerate(zip(*fragments), start=1)
+        )
+        
+        # Limit to first 100 rows for LLM context
+        if total_rows > TEXT_PREVIEW_ROWS:
+            lines.append(f"... and {total_rows - TEXT_PREVIEW_ROWS} more rows")
         
         return "\n".join(lines)
@@ -3,14 +3,31 @@
 import pandas as pd
 import re
 import uuid
-from io import BytesIO
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, List, Sequence, Tuple
+from uuid import UUID
+from sqlalchemy import distinct, func, insert
 from sqlalchemy.orm import Session
 
+from ingestion.excel_extractor import read_excel
 from models.models import Document, ExtractedRecord, Anomaly
 from models.schemas import LegacyConversionResult
 
+# Currency symbols, thousands separators and whitespace in cost cells
+_COST_CLEAN_RE = re.compile(r'[$,\s]')
+
+# Accepted date formats, tried in order (month-first before day-first)
+_DATE_FORMATS = (
+    '%Y-%m-%d',
+    '%m/%d/%Y',
+    '%d/%m/%Y',
+    '%Y/%m/%d',
+    '%m-%d-%Y',
+    '%d-%m-%Y',
+)
+
 
 class LegacyConverter:
     """
@@ -20,95 +37,149 @@ class LegacyConverter:
     standard schema fields.
     """
     
-    # Standard schema fields
-    STANDARD_FIELDS = {
-        'component': ['component', 'comp', 'part', 'item', 'equipment', 'asset'],
-        'system': ['system', 'sys', 'subsystem', 'category', 'type'],
-        'priority': ['priority', 'prio', 'urgency', 'level', 'importance'],
-        'maint_action': ['action', 'maintenance', 'maint', 'work', 'repair', 'task', 'description'],
-        'cost_estimate': ['cost', 'estimate', 'price', 'amount', 'budget', 'expense'],
-        'start_date': ['start', 'begin', 'started', 'initiate', 'open_date'],
-        'end_date': ['end', 'complete', 'finish', 'closed', 'due', 'target'],
-        'notes': ['notes', 'remarks', 'comments', 'details', 'info', 'additional']
+    # Standard schema fields; read-only, since column matching is memoized
+    STANDARD_FIELDS = MappingProxyType({
+        'component': ('component', 'comp', 'part', 'item', 'equipment', 'asset'),
+        'system': ('system', 'sys', 'subsystem', 'category', 'type'),
+        'priority': ('priority', 'prio', 'urgency', 'level', 'importance'),
+        'maint_action': ('action', 'maintenance', 'maint', 'work', 'repair', 'task', 'description'),
+        'cost_estimate': ('cost', 'estimate', 'price', 'amount', 'budget', 'expense'),
+        'start_date': ('start', 'begin', 'started', 'initiate', 'open_date'),
+        'end_date': ('end', 'complete', 'finish', 'closed', 'due', 'target'),
+        'notes': ('notes', 'remarks', 'comments', 'details', 'info', 'additional')
+    })
+    
+    # Fields whose absence is flagged; a missing mapping is reported once per document
+    REQUIRED_FIELDS = {
+        'component': ('high', 'Missing component/part identifier', 'Review source document for component name'),
+        'priority': ('medium', 'Missing priority level', 'Assign default priority based on maintenance type'),
+    }
+    
+    # Fields parsed column-wise before the row loop instead of per cell
+    TYPED_FIELDS = ('cost_estimate', 'start_date', 'end_date')
+    
+    # Legacy priority labels mapped to standard values
+    PRIORITY_MAP = {
+        '1': 'high', 'high': 'high', 'critical': 'high', 'urgent': 'high', 'p1': 'high',
+        '2': 'medium', 'medium': 'medium', 'moderate': 'medium', 'normal': 'medium', 'p2': 'medium',
+        '3': 'low', 'low': 'low', 'minor': 'low', 'routine': 'low', 'p3': 'low',
     }
     
     def __init__(self, db: Session):
         self.db = db
     
-    async def convert(
+    def convert(
         self, 
-        file_content: bytes, 
-        filename: str
+        document_id: UUID, 
+        file_path: str
     ) -> LegacyConversionResult:
         """
-        Convert a legacy Excel file to normalized records.
+        Convert a stored legacy Excel file into normalized records.
         
         Args:
-            file_content: Excel file bytes
-            filename: Original filename
+            document_id: UUID of the placeholder document created on upload
+            file_path: Path of the uploaded Excel file
             
         Returns:
             Conversion result with statistics
         """
+        document = self.db.query(Document).filter(Document.id == document_id).first()
+        if not document:
+            raise ValueError(f"Document {document_id} not found")
+        
+        try:
+            return self._convert_into(document, file_path)
+        except Exception as e:
+            self.db.rollback()
+            document.processing_status = f"error: {str(e)[:100]}"
+            self.db.commit()
+            raise
+    
+    def _convert_into(self, document: Document, file_path: str) -> LegacyConversionResult:
+        """Read the Excel file and attach its records to the document."""
         # Read Excel file
-        df = pd.read_excel(BytesIO(file_content))
+        df = read_excel(file_path)
         
         # Map columns to standard schema
         column_mappings = self._map_columns(df.columns.tolist())
         
-        # Create document record
-        document = Document(
-            filename=filename,
-            file_type="legacy_excel",
-            file_size=len(file_content),
-            processing_status="converted",
-            processed=True
-        )
-        self.db.add(document)
-        self.db.flush()
+        # Normalize priorities and parse costs and dates per column into helper
+        # columns, so a source column that also maps to a text field keeps its raw values
+        row_mappings = dict(column_mappings)
+        if 'priority' in column_mappings:
+            df["__priority"] = self._normalize_priority_column(df[column_mappings['priority']])
+            row_mappings['priority'] = "__priority"
+        for field in self.TYPED_FIELDS:
+            source_col = column_mappings.get(field)
+            if source_col is None:
+                continue
+            if field == 'cost_estimate':
+                df[f"__{field}"] = self._parse_cost_column(df[source_col])
+            else:
+                df[f"__{field}"] = self._parse_date_column(df[source_col])
+            row_mappings[field] = f"__{field}"
+        
+        # Pull mapped columns out as plain lists once; rows index into them
+        columns = list(self._extract_columns(df, row_mappings).items())
         
-        # Convert rows to records
-        records_created = 0
+        # An unmapped required column would flag every row identically;
+        # report it once against the document and skip the per-row check
+        missing_required = [f for f in self.REQUIRED_FIELDS if f not in column_mappings]
+        anomaly_rows = [
+            self._missing_column_anomaly(document.id, field) for field in missing_required
+        ]
+        
+        # Convert rows to records; ids are generated here so anomalies can
+        # reference their record without a flush per row
+        record_rows = []
         records_with_issues = 0
         
-        for idx, row in df.iterrows():
-            record_data = self._extract_record_data(row, column_mappings)
-            issues = self._validate_record(record_data)
-            
-            record = ExtractedRecord(
-                document_id=document.id,
-                component=record_data.get('component'),
-                system=record_data.get('system'),
-                priority=self._normalize_priority(record_data.get('priority')),
-                maint_action=record_data.get('maint_action'),
-                cost_estimate=self._parse_cost(record_data.get('cost_estimate')),
-                start_date=self._parse_date(record_data.get('start_date')),
-                end_date=self._parse_date(record_data.get('end_date')),
-                summary_notes=record_data.get('notes'),
-                status='open',
-                extraction_method='legacy_conversion',
-                confidence_score=0.85 if not issues else 0.60
-            )
-            self.db.add(record)
-            self.db.flush()
+        for i in range(len(df)):
+            record_data = {field: values[i] for field, values in columns if values[i] is not None}
+            issues = self._validate_record(record_data, skip_fields=missing_required)
             
-            records_created += 1
+            record_id = uuid.uuid4()
+            record_rows.append({
+                'id': record_id,
+                'document_id': document.id,
+                'component': record_data.get('component'),
+                'system': record_data.get('system'),
+                'priority': record_data.get('priority'),
+                'maint_action': record_data.get('maint_action'),
+                'cost_estimate': record_data.get('cost_estimate'),
+                'start_date': record_data.get('start_date'),
+                'end_date': record_data.get('end_date'),
+                'summary_notes': record_data.get('notes'),
+                'status': 'open',
+                'extraction_method': 'legacy_conversion',
+                'confidence_score': 0.85 if not issues and not missing_required else 0.60
+            })
             
             # Create anomalies for issues
             if issues:
                 records_with_issues += 1
                 for issue in issues:
-                    anomaly = Anomaly(
-                        record_id=record.id,
-                        document_id=document.id,
-                        anomaly_type=issue['type'],
-                        severity=issue['severity'],
-                        description=issue['description'],
-                        field_name=issue.get('field'),
-                        suggested_fix=issue.get('fix')
-                    )
-                    self.db.add(anomaly)
+                    anomaly_rows.append({
+                        'id': uuid.uuid4(),
+                        'record_id': record_id,
+                        'document_id': document.id,
+                        'anomaly_type': issue['type'],
+                        'severity': issue['severity'],
+                        'description': issue['description'],
+                        'field_name': issue.get('field'),
+                        'suggested_fix': issue.get('fix')
+                    })
         
+        # One executemany per table instead of a round-trip per row
+        if record_rows:
+            self.db.execute(insert(ExtractedRecord), record_rows)
+        if anomaly_rows:
+            self.db.execute(insert(Anomaly), anomaly_rows)
+        records_created = len(record_rows)
+        
+        document.column_mappings = column_mappings
+        document.processing_status = "converted"
+        document.processed = True
         self.db.commit()
         
         return LegacyConversionResult(
@@ -117,7 +188,25 @@ class LegacyConverter:
             records_created=records_created,
             records_with_issues=records_with_issues,
             column_mappings=column_mappings,
-            message=f"Successfully converted {records_created} records from {filename}"
+            message=f"Successfully converted {records_created} records from {document.filename}"
+        )
+    
+    def get_result(self, document: Document) -> LegacyConversionResult:
+        """Rebuild the conversion result of an already converted document."""
+        records_created = self.db.query(func.count(ExtractedRecord.id)).filter(
+            ExtractedRecord.document_id == document.id
+        ).scalar()
+        records_with_issues = self.db.query(func.count(distinct(Anomaly.record_id))).filter(
+            Anomaly.document_id == document.id
+        ).scalar()
+        
+        return LegacyConversionResult(
+            success=True,
+            document_id=document.id,
+            records_created=records_created or 0,
+            records_with_issues=records_with_issues or 0,
+            column_mappings=document.column_mappings or {},
+            message=f"Successfully converted {records_created or 0} records from {document.filename}"
         )
     
     def _map_columns(self, columns: List[str]) -> Dict[str, str]:
@@ -130,148 +219,129 @@ class LegacyConverter:
         Returns:
             Dictionary mapping standard fields to source columns
         """
+        # Exports from the same legacy system repeat one header row, so the
+        # matching is memoized by the column tuple; each caller gets its own dict
+        return dict(self._match_columns(tuple(columns)))
+    
+    @classmethod
+    @lru_cache(maxsize=256)
+    def _match_columns(cls, columns: Tuple[Any, ...]) -> Tuple[Tuple[str, Any], ...]:
+        """Match a header row to standard fields, as (field, source column) pairs."""
         mappings = {}
-        columns_lower = {c.lower().strip(): c for c in columns}
+        # Normalize each column name once rather than per keyword
+        columns_lower = list({str(c).lower().strip(): c for c in columns}.items())
         
-        for standard_field, keywords in self.STANDARD_FIELDS.items():
+        # First keyword (in priority order) that any column contains wins
+        for standard_field, keywords in cls.STANDARD_FIELDS.items():
             for keyword in keywords:
-                for col_lower, col_original in columns_lower.items():
-                    if keyword in col_lower:
-                        if standard_field not in mappings:
-                            mappings[standard_field] = col_original
-                        break
-                if standard_field in mappings:
+                hit = next((orig for low, orig in columns_lower if keyword in low), None)
+                if hit is not None:
+                    mappings[standard_field] = hit
                     break
         
-        return mappings
+        return tuple(mappings.items())
     
-    def _extract_record_data(
-        self, 
-        row: pd.Series, 
-        mappings: Dict[str, str]
-    ) -> Dict[str, any]:
-        """Extract record data using column mappings."""
-        data = {}
+    def _extract_columns(self, df: pd.DataFrame, mappings: Dict[str, str]) -> Dict[str, List[Any]]:
+        """
+        Extract each mapped column as a plain list, with None for missing cells.
+        
+        Typed fields keep their parsed value; everything else is stripped text.
+        """
+        columns = {}
         for standard_field, source_col in mappings.items():
-            if source_col in row.index:
-                value = row[source_col]
-                if pd.notna(value):
-                    data[standard_field] = str(value).strip()
-        return data
+            values = df[source_col]
+            present = values.notna().tolist()
+            if standard_field in self.TYPED_FIELDS:
+                columns[standard_field] = [
+                    v if ok else None for v, ok in zip(values.tolist(), present)
+                ]
+            else:
+                columns[standard_field] = [
+                    str(v).strip() if ok else None for v, ok in zip(values.tolist(), present)
+                ]
+        return columns
+    
+    def _missing_column_anomaly(self, document_id: UUID, field: str) -> Dict:
+        """Build a document-level anomaly for a required field with no source column."""
+        severity, description, fix = self.REQUIRED_FIELDS[field]
+        return {
+            'id': uuid.uuid4(),
+            'record_id': None,
+            'document_id': document_id,
+            'anomaly_type': 'missing_column',
+            'severity': severity,
+            'description': f'No {field} column found; {description[0].lower()}{description[1:]} in every row',
+            'field_name': field,
+            'suggested_fix': fix
+        }
     
-    def _validate_record(self, data: Dict) -> List[Dict]:
-        """Validate record and return list of issues."""
+    def _validate_record(self, data: Dict, skip_fields: Sequence[str] = ()) -> List[Dict]:
+        """
+        Validate record and return list of issues.
+        
+        Required fields in skip_fields are not checked; their absence was
+        already reported at document level.
+        """
         issues = []
         
         # Check for missing critical fields
-        if not data.get('component'):
+        for field, (severity, description, fix) in self.REQUIRED_FIELDS.items():
+            if field not in skip_fields and not data.get(field):
+                issues.append({
+                    'type': 'missing_field',
+                    'severity': severity,
+                    'field': field,
+                    'description': description,
+                    'fix': fix
+                })
+        
+        # Check date consistency
+        start = data.get('start_date')
+        end = data.get('end_date')
+        if start and end and start > end:
             issues.append({
-                'type': 'missing_field',
+                'type': 'date_inconsistency',
                 'severity': 'high',
-                'field': 'component',
-                'description': 'Missing component/part identifier',
-                'fix': 'Review source document for component name'
+                'field': 'start_date,end_date',
+                'description': f'Start date ({start}) is after end date ({end})',
+                'fix': 'Verify and correct date sequence'
             })
         
-        if not data.get('priority'):
+        # Check cost estimate
+        cost_val = data.get('cost_estimate')
+        if cost_val and cost_val > 1000000:
             issues.append({
-                'type': 'missing_field',
+                'type': 'extreme_value',
                 'severity': 'medium',
-                'field': 'priority',
-                'description': 'Missing priority level',
-                'fix': 'Assign default priority based on maintenance type'
+                'field': 'cost_estimate',
+                'description': f'Unusually high cost estimate: ${cost_val:,.2f}',
+                'fix': 'Verify cost value is correct'
             })
         
-        # Check date consistency
-        start = data.get('start_date')
-        end = data.get('end_date')
-        if start and end:
-            try:
-                start_dt = self._parse_date(start)
-                end_dt = self._parse_date(end)
-                if start_dt and end_dt and start_dt > end_dt:
-                    issues.append({
-                        'type': 'date_inconsistency',
-                        'severity': 'high',
-                        'field': 'start_date,end_date',
-                        'description': f'Start date ({start}) is after end date ({end})',
-                        'fix': 'Verify and correct date sequence'
-                    })
-            except (ValueError, TypeError):
-                pass  # Date comparison not possible
-        
-        # Check cost estimate
-        cost = data.get('cost_estimate')
-        if cost:
-            try:
-                cost_val = self._parse_cost(cost)
-                if cost_val and cost_val > 1000000:
-                    issues.append({
-                        'type': 'extreme_value',
-                        'severity': 'medium',
-                        'field': 'cost_estimate',
-                        'description': f'Unusually high cost estimate: ${cost_val:,.2f}',
-                        'fix': 'Verify cost value is correct'
-                    })
-            except (ValueError, TypeError):
-                issues.append({
-                    'type': 'parse_error',
-                    'severity': 'low',
-                    'field': 'cost_estimate',
-                    'description': f'Could not parse cost value: {cost}',
-                    'fix': 'Convert to numeric format'
-                })
-        
         return issues
     
-    def _normalize_priority(self, value: Optional[str]) -> Optional[str]:
-        """Normalize priority to standard values."""
-        if not value:
-            return None
-        
-        value_lower = value.lower().strip()
-        
-        # Map various priority formats
-        if value_lower in ['1', 'high', 'critical', 'urgent', 'p1']:
-            return 'high'
-        elif value_lower in ['2', 'medium', 'moderate', 'normal', 'p2']:
-            return 'medium'
-        elif value_lower in ['3', 'low', 'minor', 'routine', 'p3']:
-            return 'low'
-        
-        return value
+    @classmethod
+    def _normalize_priority_column(cls, values: pd.Series) -> pd.Series:
+        """Map a priority column to standard values, keeping unknown labels as-is."""
+        text = values.astype(str).str.strip()
+        return text.str.lower().map(cls.PRIORITY_MAP).fillna(text).where(values.notna())
     
-    def _parse_cost(self, value: Optional[str]) -> Optional[float]:
-        """Parse cost string to float."""
-        if not value:
-            return None
-        
-        try:
-            # Remove currency symbols and commas
-            cleaned = re.sub(r'[$,\s]', '', str(value))
-            return float(cleaned)
-        except (ValueError, TypeError):
-            return None
+    @staticmethod
+    def _parse_cost_column(values: pd.Series) -> pd.Series:
+        """Parse a cost column to floats; unparseable cells become NaN."""
+        # Remove currency symbols and commas
+        cleaned = values.astype(str).str.replace(_COST_CLEAN_RE, '', regex=True)
+        return pd.to_numeric(cleaned, errors='coerce')
     
-    def _parse_date(self, value: Optional[str]):
-        """Parse date string to date object."""
-        if not value:
-            return None
-        
-        # Handle various date formats
-        formats = [
-            '%Y-%m-%d',
-            '%m/%d/%Y',
-            '%d/%m/%Y',
-            '%Y/%m/%d',
-            '%m-%d-%Y',
-            '%d-%m-%Y'
-        ]
-        
-        for fmt in formats:
-            try:
-                return datetime.strptime(str(value).strip(), fmt).date()
-            except ValueError:
-                continue
-        
-        return None
+    @staticmethod
+    def _parse_date_column(values: pd.Series) -> pd.Series:
+        """Parse a date column to date objects; unparseable cells become NaT."""
+        if pd.api.types.is_datetime64_any_dtype(values):
+            return values.dt.date
+        # Cells Excel already typed as dates are taken as-is; text must match one
+        # of the accepted formats exactly, tried in order
+        parsed = pd.to_datetime(values.where(values.map(lambda v: isinstance(v, datetime))), errors='coerce')
+        text = values.astype(str).str.strip()
+        for fmt in _DATE_FORMATS:
+            parsed = parsed.fillna(pd.to_datetime(text, format=fmt, errors='coerce'))
+        return parsed.dt.date
@@ -1,8 +1,81 @@
-"""PDF text extraction using pdfplumber."""
+"""PDF text extraction using pdfium, with pdfplumber for tables."""
 
+import multiprocessing
+import os
+import tempfile
+import threading
 import pdfplumber
-from io import BytesIO
-from typing import Optional
+import pypdfium2 as pdfium
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Union
+
+# Documents with at least this many pages are split across worker processes
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "50"))
+PDF_MAX_WORKERS = int(os.getenv("PDF_MAX_WORKERS", str(os.cpu_count() or 1)))
+# In-memory PDFs larger than this are spooled to disk before extraction
+PDF_SPOOL_BYTES = 10 * 1024 * 1024  # 10MB
+
+# Maintenance tables are fully ruled, so cell edges come from drawn lines only
+TABLE_SETTINGS = {
+    "vertical_strategy": "lines",
+    "horizontal_strategy": "lines",
+    "intersection_tolerance": 5,
+}
+
+
+# Shared page-worker pool, created on first use. Workers are spawned rather
+# than forked: extraction runs on to_thread workers, and forking a threaded
+# process can deadlock the child on a lock held by another thread.
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Return the shared page-worker pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_MAX_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_pdf_pool() -> None:
+    """Stop the shared page-worker pool; the next large PDF starts a new one."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def _page_text(pdf: pdfium.PdfDocument, index: int) -> str:
+    """Extract the text of a single page."""
+    page = pdf[index]
+    try:
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range().replace("\r\n", "\n").strip()
+        finally:
+            textpage.close()
+    finally:
+        page.close()
+
+
+def _extract_page_range(source: Union[str, bytes], start: int, stop: int) -> List[str]:
+    """
+    Extract the text of pages [start, stop).
+    
+    Opens its own document handle, so it can run in a worker process;
+    pdfium is not safe to share across threads.
+    """
+    pdf = pdfium.PdfDocument(source)
+    try:
+        return [_page_text(pdf, i) for i in range(start, stop)]
+    finally:
+        pdf.close()
 
 
 class PDFExtractor:
@@ -18,15 +91,7 @@ class PDFExtractor:
         Returns:
             Extracted text content
         """
-        text_parts = []
-        
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text_parts.append(page_text)
-        
-        return "\n\n".join(text_parts)
+        return self._extract(file_path)
     
     def extract_text_from_bytes(self, content: bytes) -> str:
         """
@@ -38,32 +103,58 @@ class PDFExtractor:
         Returns:
             Extracted text content
         """
-        text_parts = []
+        if len(content) <= PDF_SPOOL_BYTES:
+            return self._extract(content)
         
-        with pdfplumber.open(BytesIO(content)) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text_parts.append(page_text)
+        # Large PDFs are read from a file so pdfium and page workers share the
+        # OS page cache instead of each holding (and unpickling) a copy
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+            tmp.write(content)
+            tmp.flush()
+            return self._extract(tmp.name)
+    
+    def _extract(self, source: Union[str, bytes]) -> str:
+        """Extract page texts, fanning large documents out to worker processes."""
+        pdf = pdfium.PdfDocument(source)
+        try:
+            page_count = len(pdf)
+            # Daemonic processes (e.g. Celery prefork children) cannot spawn a pool
+            if (
+                page_count < PDF_PARALLEL_MIN_PAGES
+                or PDF_MAX_WORKERS < 2
+                or multiprocessing.current_process().daemon
+            ):
+                texts = [_page_text(pdf, i) for i in range(page_count)]
+                return "\n\n".join(text for text in texts if text)
+        finally:
+            pdf.close()
         
-        return "\n\n".join(text_parts)
+        workers = min(PDF_MAX_WORKERS, page_count)
+        step = -(-page_count // workers)
+        bounds = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+        
+        pool = _get_pool()
+        futures = [pool.submit(_extract_page_range, source, start, stop) for start, stop in bounds]
+        texts = [text for future in futures for text in future.result()]
+        
+        return "\n\n".join(text for text in texts if text)
     
-    def extract_tables(self, file_path: str) -> list:
+    def extract_tables(self, file_path: str) -> Iterator[List[List[Optional[str]]]]:
         """
-        Extract tables from a PDF file.
+        Extract ruled tables from a PDF file.
+        
+        Only pages that contain drawn lines or rectangles are searched, and
+        tables are yielded one at a time instead of collected in a list.
         
         Args:
             file_path: Path to the PDF file
             
-        Returns:
-            List of tables (each table is a list of rows)
+        Yields:
+            Tables, each a list of rows
         """
-        tables = []
-        
         with pdfplumber.open(file_path) as pdf:
             for page in pdf.pages:
-                page_tables = page.extract_tables()
-                if page_tables:
-                    tables.extend(page_tables)
-        
-        return tables
+                # Text-only pages cannot hold a ruled table; skip edge detection
+                if not page.lines and not page.rects:
+                    continue
+                yield from page.extract_tables(TABLE_SETTINGS)
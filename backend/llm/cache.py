@@ -0,0 +1,210 @@
+"""Two-tier response cache for LLM generation calls."""
+
+import hashlib
+import json
+import os
+from typing import Any, AsyncIterator, Optional, Tuple
+
+import redis.asyncio as redis
+
+from core.cache import TTLCache
+from core.logging import get_logger
+
+logger = get_logger("llm.cache")
+
+KEY_PREFIX = "mdia:llm:"
+
+
+class ResponseCache:
+    """
+    Cache LLM responses keyed by a hash of the full request.
+
+    L1 is an in-process TTL cache; L2 is Redis, used only when
+    REDIS_URL is configured. Redis failures degrade to L1 only.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 300.0,
+        redis_url: Optional[str] = None
+    ):
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.redis: Optional[redis.Redis] = (
+            redis.Redis.from_url(redis_url, decode_responses=True) if redis_url else None
+        )
+
+    @staticmethod
+    def make_key(
+        namespace: str,
+        prompt: str,
+        system_prompt: Optional[str],
+        params: dict
+    ) -> str:
+        """Build a namespaced cache key from the prompt and generation params."""
+        payload = json.dumps([system_prompt, prompt, params], sort_keys=True)
+        digest = hashlib.sha256(payload.encode()).hexdigest()
+        return f"{KEY_PREFIX}{namespace}:{digest}"
+
+    async def get(self, key: str) -> Optional[str]:
+        """Look up a response, promoting L2 hits into L1."""
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        if self.redis is None:
+            return None
+
+        try:
+            # Fetch the remaining lifetime too, so the L1 copy expires with the L2 entry
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.ttl(key)
+            value, remaining = await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Redis cache read failed: {type(e).__name__}: {e}")
+            return None
+
+        if value is not None:
+            # remaining is negative when the key has no expiry
+            self.local.set(key, value, min(remaining, self.local.ttl) if remaining > 0 else None)
+        return value
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        """Store a response in both tiers, expiring after ttl seconds in each."""
+        self.local.set(key, value, ttl)
+
+        if self.redis is None:
+            return
+
+        try:
+            await self.redis.setex(key, ttl, value)
+        except redis.RedisError as e:
+            logger.warning(f"Redis cache write failed: {type(e).__name__}: {e}")
+
+    async def invalidate(self, namespace: str) -> None:
+        """Drop every cached response under a namespace."""
+        prefix = f"{KEY_PREFIX}{namespace}:"
+        self.local.delete_prefix(prefix)
+
+        if self.redis is None:
+            return
+
+        try:
+            keys = [key async for key in self.redis.scan_iter(match=f"{prefix}*")]
+            if keys:
+                await self.redis.delete(*keys)
+        except redis.RedisError as e:
+            logger.warning(f"Redis cache invalidation failed: {type(e).__name__}: {e}")
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Get or create the response cache singleton."""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache(redis_url=os.getenv("REDIS_URL"))
+    return _response_cache
+
+
+async def close_response_cache() -> None:
+    """
+    Close the cache's Redis pool and drop the singleton.
+
+    Redis connections belong to the event loop that opened them, so callers
+    that run one loop per job close the cache before their loop ends; the
+    next get_response_cache() builds a fresh one.
+    """
+    global _response_cache
+    cache, _response_cache = _response_cache, None
+    if cache is not None and cache.redis is not None:
+        try:
+            await cache.redis.aclose()
+        except RuntimeError as e:
+            # Its event loop is already gone, and so are its sockets
+            logger.warning(f"Could not close Redis cache client: {type(e).__name__}: {e}")
+
+
+async def cached_generate(
+    client: Any,
+    prompt: str,
+    system_prompt: Optional[str] = None,
+    namespace: str = "default",
+    ttl: int = 3600,
+    **params: Any
+) -> Tuple[str, bool]:
+    """
+    Generate a response, serving identical requests from cache.
+
+    Args:
+        client: LLM client exposing an async generate() and a model name
+        prompt: User prompt
+        system_prompt: Optional system context
+        namespace: Cache namespace used for targeted invalidation
+        ttl: Seconds to keep the response in Redis
+        **params: Generation parameters passed through to generate()
+
+    Returns:
+        Tuple of (response text, whether it was a cache hit)
+    """
+    cache = get_response_cache()
+    key = cache.make_key(namespace, prompt, system_prompt, {**params, "model": client.model})
+
+    cached = await cache.get(key)
+    if cached is not None:
+        return cached, True
+
+    response = await client.generate(prompt=prompt, system_prompt=system_prompt, **params)
+
+    # Never cache failures; empty responses signal the model was unavailable
+    if response:
+        await cache.set(key, response, ttl)
+
+    return response, False
+
+
+async def cached_generate_stream(
+    client: Any,
+    prompt: str,
+    system_prompt: Optional[str] = None,
+    namespace: str = "default",
+    ttl: int = 3600,
+    **params: Any
+) -> AsyncIterator[str]:
+    """
+    Stream a response, serving identical requests from cache.
+
+    Shares keys with cached_generate(), so a response cached by either is
+    served by both. A hit is yielded as a single chunk; a miss is streamed
+    from the client and cached once it completes. Errors from the client
+    propagate, and a response cut short by one is not cached.
+
+    Args:
+        client: LLM client exposing an async generate_stream() and a model name
+        prompt: User prompt
+        system_prompt: Optional system context
+        namespace: Cache namespace used for targeted invalidation
+        ttl: Seconds to keep the response in Redis
+        **params: Generation parameters passed through to generate_stream()
+
+    Yields:
+        Text chunks of the response
+    """
+    cache = get_response_cache()
+    key = cache.make_key(namespace, prompt, system_prompt, {**params, "model": client.model})
+
+    cached = await cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    chunks = []
+    async for chunk in client.generate_stream(prompt=prompt, system_prompt=system_prompt, **params):
+        chunks.append(chunk)
+        yield chunk
+
+    response = "".join(chunks)
+    if response:
+        await cache.set(key, response, ttl)
@@ -3,13 +3,106 @@
 import os
 import json
 import re
-from typing import Optional, Dict, Any, List
-from huggingface_hub import InferenceClient
+import asyncio
+import time
+from typing import AsyncIterator, Optional, Dict, Any, List, Tuple
+
+import httpx
 
 from core.logging import get_logger
 
+# SIMD-accelerated JSON parsing for model responses when available
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 logger = get_logger("llm")
 
+# OpenAI-compatible chat completion endpoint of the HF Inference router
+HF_CHAT_URL = os.getenv("HF_CHAT_URL", "https://router.huggingface.co/v1/chat/completions")
+HF_REQUEST_TIMEOUT = float(os.getenv("HF_REQUEST_TIMEOUT", "60"))
+# Upper bound on chat requests in flight at once, per event loop
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Seconds after a successful call during which the service is assumed available
+LLM_AVAILABILITY_TTL = float(os.getenv("LLM_AVAILABILITY_TTL", "60"))
+
+# Patterns for pulling JSON out of free-form model output
+_CODEBLOCK_RE = re.compile(r'```(?:json)?\s*([\s\S]*?)\s*```')
+_JSON_ARRAY_RE = re.compile(r'\[[\s\S]*\]')
+
+# Shared connection pool for all LLM calls, bound to the event loop that created it
+_http_client: Optional[httpx.AsyncClient] = None
+_http_loop: Optional[asyncio.AbstractEventLoop] = None
+_request_semaphore: Optional[asyncio.Semaphore] = None
+_semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def open_http_client() -> httpx.AsyncClient:
+    """
+    Open the pooled HTTP client for the running event loop.
+    
+    Connections are kept alive and reused across requests, so TLS setup
+    happens once per connection rather than once per LLM call. The owner of
+    the loop (the app lifespan, or a worker task) opens the client and must
+    release it with close_http_client() before the loop ends.
+    """
+    global _http_client, _http_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is not None and _http_loop is loop:
+        return _http_client
+    if _http_client is not None:
+        # A previous loop ended without closing its client; release its pool
+        logger.warning("LLM HTTP client from a previous event loop was not closed")
+        await close_http_client()
+    _http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        timeout=HF_REQUEST_TIMEOUT
+    )
+    _http_loop = loop
+    return _http_client
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the pooled HTTP client opened for the running event loop.
+    
+    Raises:
+        RuntimeError: If open_http_client() was not called on this loop
+    """
+    if _http_client is None or _http_loop is not asyncio.get_running_loop():
+        raise RuntimeError("LLM HTTP client is not open on this event loop")
+    return _http_client
+
+
+def get_request_semaphore() -> asyncio.Semaphore:
+    """
+    Get the semaphore limiting concurrent chat requests on the running loop.
+    
+    Lets callers fan out with asyncio.gather without exceeding the
+    endpoint's rate limit.
+    """
+    global _request_semaphore, _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _request_semaphore is None or _semaphore_loop is not loop:
+        _request_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        _semaphore_loop = loop
+    return _request_semaphore
+
+
+async def close_http_client() -> None:
+    """Close the pooled HTTP client, if one was opened."""
+    global _http_client, _http_loop
+    client, _http_client, _http_loop = _http_client, None, None
+    if client is not None:
+        try:
+            await client.aclose()
+        except RuntimeError as e:
+            # Its event loop is already gone, and so are its sockets
+            logger.warning(f"Could not close LLM HTTP client: {type(e).__name__}: {e}")
+
 
 class LLMClient:
     """
@@ -30,12 +123,41 @@ class LLMClient:
         """
         self.model = model or self.DEFAULT_MODEL
         self.token = os.getenv("HF_TOKEN")
+        self._last_success: Optional[float] = None
+    
+    def _request(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: Optional[float] = None
+    ) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """Build the chat completion payload and headers."""
+        payload: Dict[str, Any] = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+        }
+        if temperature is not None:
+            payload["temperature"] = temperature
         
-        # Initialize the client - it will use serverless inference API
-        if self.token:
-            self.client = InferenceClient(model=self.model, token=self.token)
-        else:
-            self.client = InferenceClient(model=self.model)
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        return payload, headers
+    
+    async def _chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: Optional[float] = None
+    ) -> str:
+        """Call the chat completion endpoint over the shared connection pool."""
+        payload, headers = self._request(messages, max_tokens, temperature)
+        
+        async with get_request_semaphore():
+            response = await get_http_client().post(HF_CHAT_URL, json=payload, headers=headers)
+        response.raise_for_status()
+        content = response.json()["choices"][0]["message"]["content"]
+        self._last_success = time.monotonic()
+        return content
     
     async def generate(
         self,
@@ -64,20 +186,69 @@ class LLMClient:
             
             messages.append({"role": "user", "content": prompt})
             
-            response = self.client.chat_completion(
-                model=self.model,
+            return await self._chat_completion(
                 messages=messages,
                 max_tokens=max_tokens,
                 temperature=temperature
             )
             
-            return response.choices[0].message.content
-            
         except Exception as e:
             # Log error and return empty for graceful degradation
             logger.error(f"LLM generation error: {type(e).__name__}: {e}")
             return ""
     
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        max_tokens: int = 2048,
+        temperature: float = 0.1
+    ) -> AsyncIterator[str]:
+        """
+        Stream a text response from the LLM as it is generated.
+        
+        Reads the endpoint's server-sent events and yields each content
+        delta, so callers can forward text before generation finishes.
+        Unlike generate(), errors are raised rather than swallowed: a
+        failure after the first chunk leaves a truncated response that
+        the caller must be able to tell apart from a complete one.
+        
+        Args:
+            prompt: User prompt
+            system_prompt: Optional system context
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature (lower = more deterministic)
+            
+        Yields:
+            Text chunks of the response, in order
+        """
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        
+        payload, headers = self._request(messages, max_tokens, temperature)
+        payload["stream"] = True
+        
+        # The request slot is held until the stream is fully read
+        async with get_request_semaphore():
+            async with get_http_client().stream(
+                "POST", HF_CHAT_URL, json=payload, headers=headers
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = _json_loads(data).get("choices") or []
+                    content = choices[0].get("delta", {}).get("content") if choices else None
+                    if content:
+                        yield content
+        
+        self._last_success = time.monotonic()
+    
     async def extract_json(
         self,
         prompt: str,
@@ -104,21 +275,24 @@ class LLMClient:
         """
         Parse JSON from LLM response, handling common issues.
         """
-        # Try direct parse first
-        try:
-            result = json.loads(text)
-            if isinstance(result, list):
-                return result
-            elif isinstance(result, dict):
-                return [result]
-        except json.JSONDecodeError:
-            pass
+        text = text.strip()
+        
+        # Try direct parse first, skipping it when the text cannot be bare JSON
+        if text.startswith(('[', '{')):
+            try:
+                result = _json_loads(text)
+                if isinstance(result, list):
+                    return result
+                elif isinstance(result, dict):
+                    return [result]
+            except json.JSONDecodeError:
+                pass
         
         # Try to extract JSON from markdown code block
-        json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', text)
+        json_match = _CODEBLOCK_RE.search(text)
         if json_match:
             try:
-                result = json.loads(json_match.group(1))
+                result = _json_loads(json_match.group(1))
                 if isinstance(result, list):
                     return result
                 elif isinstance(result, dict):
@@ -127,10 +301,10 @@ class LLMClient:
                 pass
         
         # Try to find JSON array in text
-        array_match = re.search(r'\[[\s\S]*\]', text)
+        array_match = _JSON_ARRAY_RE.search(text)
         if array_match:
             try:
-                result = json.loads(array_match.group(0))
+                result = _json_loads(array_match.group(0))
                 if isinstance(result, list):
                     return result
             except json.JSONDecodeError:
@@ -138,12 +312,19 @@ class LLMClient:
         
         return None
     
-    def is_available(self) -> bool:
-        """Check if the LLM service is available."""
+    async def is_available(self) -> bool:
+        """
+        Check if the LLM service is available.
+        
+        Any successful call within LLM_AVAILABILITY_TTL seconds counts,
+        so the probe request is only sent when the client has been idle.
+        """
+        if self._last_success is not None and time.monotonic() - self._last_success < LLM_AVAILABILITY_TTL:
+            return True
+        
         try:
             # Quick test with minimal tokens
-            response = self.client.chat_completion(
-                model=self.model,
+            await self._chat_completion(
                 messages=[{"role": "user", "content": "Say hello"}],
                 max_tokens=10
             )
@@ -153,3 +334,13 @@ class LLMClient:
             return False
 
 
+# Shared client for all LLM features; the pool it uses is bound per event loop
+_llm_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    """Get or create LLM client singleton."""
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = LLMClient()
+    return _llm_client
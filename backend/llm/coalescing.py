@@ -0,0 +1,50 @@
+"""Coalescing of identical concurrent LLM generation requests."""
+
+import asyncio
+import json
+from typing import Any, Dict, Optional, Tuple
+
+
+class CoalescingLLMProxy:
+    """
+    Share one generation among identical requests that are in flight together.
+
+    A request whose system prompt, generation params and prompt match a call
+    already running awaits that call's result instead of issuing its own;
+    distinct requests go straight to the client with no added wait. Exposes
+    the same generate() interface as LLMClient.
+    """
+
+    def __init__(self, client: Any):
+        self.client = client
+        self._inflight: Dict[Tuple[Optional[str], str, str], asyncio.Task] = {}
+
+    @property
+    def model(self) -> str:
+        return self.client.model
+
+    async def generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        **params: Any
+    ) -> str:
+        """Generate a response, joining an identical call already in flight."""
+        key = (system_prompt, json.dumps(params, sort_keys=True), prompt)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self.client.generate(prompt=prompt, system_prompt=system_prompt, **params)
+            )
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # A cancelled caller must not cancel the call other callers share
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Tuple[Optional[str], str, str], task: asyncio.Task) -> None:
+        """Drop a finished call so later requests generate afresh."""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the outcome retrieved in case every caller was cancelled
+        if not task.cancelled():
+            task.exception()
@@ -1,12 +1,118 @@
 """LLM-based structured field extraction."""
 
+import asyncio
+import os
 import re
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
-from datetime import datetime
+from datetime import date
 
-from llm.client import LLMClient
+from core.logging import get_logger
+from llm.client import LLMClient, get_llm_client
 from llm.prompts import EXTRACTION_SYSTEM_PROMPT, EXTRACTION_USER_TEMPLATE
 
+# Linear-time RE2 engine for scanning untrusted document text; patterns use
+# inline flags so they compile under either engine
+try:
+    import re2 as _regex
+except ImportError:
+    _regex = re
+
+logger = get_logger("llm.extractor")
+
+# Documents are split into overlapping windows that fit the model context
+EXTRACTION_WINDOW_CHARS = int(os.getenv("EXTRACTION_WINDOW_CHARS", "6000"))
+EXTRACTION_WINDOW_OVERLAP = int(os.getenv("EXTRACTION_WINDOW_OVERLAP", "500"))
+EXTRACTION_MAX_WINDOWS = int(os.getenv("EXTRACTION_MAX_WINDOWS", "16"))
+
+# Fields identifying the same record found in two overlapping windows
+_DEDUPE_FIELDS = ('component', 'maint_action', 'start_date')
+
+# Fallback regex extraction patterns, compiled once
+_COMPONENT_RES = [
+    _regex.compile(r'(?i)(?:component|equipment|part|item)[\s:]+([A-Za-z0-9\-_\s]+)'),
+    _regex.compile(r'(?i)([A-Z][A-Za-z0-9\-]+(?:-\d+)?)\s+(?:maintenance|repair|service)'),
+]
+_PRIORITY_RES = [
+    _regex.compile(r'(?i)(?:priority|urgency)[\s:]+(\w+)'),
+    _regex.compile(r'(?i)\b(high|medium|low|critical|urgent)\s+priority'),
+]
+_COST_RES = [
+    _regex.compile(r'\$[\d,]+(?:\.\d{2})?'),
+    _regex.compile(r'(?:cost|estimate)[\s:]+\$?([\d,]+(?:\.\d{2})?)'),
+]
+_ACTION_RES = [
+    _regex.compile(r'(?i)(?:action|repair|maintenance)[\s:]+(.+?)(?:\n|$)'),
+    _regex.compile(r'(?i)(?:work order|wo)[\s#:]+\d+[\s:]+(.+?)(?:\n|$)'),
+]
+_ISO_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+# Records produced by the regex fallback
+MAX_REGEX_RECORDS = 10
+# The fallback only searches the start of the document, so patterns with
+# few or no matches don't walk the whole text
+REGEX_SCAN_CHARS = int(os.getenv("REGEX_SCAN_CHARS", str(1024 * 1024)))
+
+# Plain decimal or scientific notation, after currency symbols and commas are removed;
+# digits may be grouped with single underscores as float() allows, but inf/nan are
+# not costs and are rejected
+_DIGITS = r'\d(?:_?\d)*'
+_NUMBER_RE = re.compile(rf'^[+-]?(?:{_DIGITS}(?:\.(?:{_DIGITS})?)?|\.{_DIGITS})(?:[eE][+-]?{_DIGITS})?$')
+
+_PRIORITY_MAP = {
+    'high': 'high', 'critical': 'high', 'urgent': 'high', '1': 'high', 'p1': 'high',
+    'medium': 'medium', 'moderate': 'medium', 'normal': 'medium', '2': 'medium', 'p2': 'medium',
+    'low': 'low', 'minor': 'low', 'routine': 'low', '3': 'low', 'p3': 'low',
+}
+# Accepted non-ISO layouts: M/D/Y (D/M/Y when M/D/Y is not a valid date),
+# Y/M/D and M-D-Y
+_DATE_RE = re.compile(
+    r'^(?:(\d{1,2})/(\d{1,2})/(\d{4})|(\d{4})/(\d{1,2})/(\d{1,2})|(\d{1,2})-(\d{1,2})-(\d{4}))$'
+)
+
+
+# Records from one document repeat the same few priority and date strings,
+# so the string-level parsing is memoized
+@lru_cache(maxsize=4096)
+def _normalize_priority_text(value: str) -> Optional[str]:
+    """Map a priority label to high/medium/low, keeping unknown labels."""
+    v = value.lower().strip()
+    if v in _PRIORITY_MAP:
+        return _PRIORITY_MAP[v]
+    return v if v != 'null' else None
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_text(value: str) -> Optional[str]:
+    """Parse a date string to YYYY-MM-DD, or None if unrecognized."""
+    s = value.strip()
+    if s.lower() == 'null':
+        return None
+    
+    # Already in correct format
+    if _ISO_DATE_RE.match(s):
+        return s
+    
+    match = _DATE_RE.match(s)
+    if not match:
+        return None
+    
+    a, b, c, y1, m1, d1, m2, d2, y2 = match.groups()
+    if a is not None:
+        candidates = [(c, a, b), (c, b, a)]
+    elif y1 is not None:
+        candidates = [(y1, m1, d1)]
+    else:
+        candidates = [(y2, m2, d2)]
+    
+    for year, month, day in candidates:
+        try:
+            return date(int(year), int(month), int(day)).isoformat()
+        except ValueError:
+            continue
+    
+    return None
+
 
 class LLMExtractor:
     """
@@ -15,8 +121,14 @@ class LLMExtractor:
     Falls back to regex-based extraction if LLM is unavailable.
     """
     
-    def __init__(self):
-        self.client = LLMClient()
+    def __init__(self, client: Optional[LLMClient] = None):
+        """
+        Initialize the extractor.
+        
+        Args:
+            client: LLM client to use; defaults to the shared singleton
+        """
+        self.client = client or get_llm_client()
     
     async def extract_records(
         self, 
@@ -35,20 +147,65 @@ class LLMExtractor:
         """
         if use_llm:
             records = await self._llm_extract(text)
-            if records:
+            # An empty list is the model's answer that there are no records;
+            # only a failed extraction (None) warrants the regex scan
+            if records is not None:
                 return self._validate_records(records)
         
         # Fallback to regex extraction
         return self._regex_extract(text)
     
     async def _llm_extract(self, text: str) -> Optional[List[Dict[str, Any]]]:
-        """Extract using LLM."""
-        # Truncate text if too long
-        max_chars = 8000
-        if len(text) > max_chars:
-            text = text[:max_chars] + "\n... [truncated]"
+        """
+        Extract using LLM.
+        
+        Long documents are split into overlapping windows that are sent
+        concurrently (bounded by the client's request semaphore); records
+        from all windows are merged and de-duplicated.
+        
+        Returns None only if no window got a parseable answer; an empty
+        list means the model found no records.
+        """
+        step = max(EXTRACTION_WINDOW_CHARS - EXTRACTION_WINDOW_OVERLAP, 1)
+        # A window is only started if it reaches past the previous one's overlap
+        last_start = max(len(text) - EXTRACTION_WINDOW_OVERLAP, 1) if text else 0
+        windows = [text[i:i + EXTRACTION_WINDOW_CHARS] for i in range(0, last_start, step)]
+        if len(windows) > EXTRACTION_MAX_WINDOWS:
+            logger.warning(
+                f"Document split into {len(windows)} windows; "
+                f"extracting the first {EXTRACTION_MAX_WINDOWS}"
+            )
+            windows = windows[:EXTRACTION_MAX_WINDOWS]
+        
+        results = await asyncio.gather(
+            *[self._extract_window(window) for window in windows],
+            return_exceptions=True
+        )
+        
+        records = []
+        seen = set()
+        answered = False
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Window extraction error: {type(result).__name__}: {result}")
+                continue
+            if result is None:
+                continue
+            answered = True
+            for record in result:
+                if not isinstance(record, dict):
+                    continue
+                key = tuple(str(record.get(f) or '').strip().lower() for f in _DEDUPE_FIELDS)
+                if key in seen:
+                    continue
+                seen.add(key)
+                records.append(record)
         
-        prompt = EXTRACTION_USER_TEMPLATE.format(document_text=text)
+        return records if answered else None
+    
+    async def _extract_window(self, window: str) -> Optional[List[Dict[str, Any]]]:
+        """Extract records from a single window of document text."""
+        prompt = EXTRACTION_USER_TEMPLATE.format(document_text=window)
         
         return await self.client.extract_json(
             prompt=prompt,
@@ -60,84 +217,64 @@ class LLMExtractor:
         Fallback regex-based extraction for common patterns.
         """
         records = []
+        text = text[:REGEX_SCAN_CHARS]
         
-        # Pattern for maintenance entries
-        patterns = {
-            'component': [
-                r'(?:component|equipment|part|item)[\s:]+([A-Za-z0-9\-_\s]+)',
-                r'([A-Z][A-Za-z0-9\-]+(?:-\d+)?)\s+(?:maintenance|repair|service)',
-            ],
-            'priority': [
-                r'(?:priority|urgency)[\s:]+(\w+)',
-                r'\b(high|medium|low|critical|urgent)\s+priority',
-            ],
-            'cost': [
-                r'\$[\d,]+(?:\.\d{2})?',
-                r'(?:cost|estimate)[\s:]+\$?([\d,]+(?:\.\d{2})?)',
-            ],
-            'date': [
-                r'\d{4}-\d{2}-\d{2}',
-                r'\d{1,2}/\d{1,2}/\d{4}',
-            ]
-        }
-        
-        # Extract components
-        components = []
-        for pattern in patterns['component']:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            components.extend(matches)
-        
-        # Find maintenance action blocks
-        action_patterns = [
-            r'(?:action|repair|maintenance)[\s:]+(.+?)(?:\n|$)',
-            r'(?:work order|wo)[\s#:]+\d+[\s:]+(.+?)(?:\n|$)',
-        ]
-        
-        actions = []
-        for pattern in action_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            actions.extend(matches)
+        # Only the first MAX_REGEX_RECORDS of each are used, so stop each
+        # scan as soon as enough matches are found
+        components = self._first_matches(_COMPONENT_RES, text, MAX_REGEX_RECORDS)
+        actions = self._first_matches(_ACTION_RES, text, MAX_REGEX_RECORDS)
         
         # Build records from extracted data
         if components or actions:
+            # Priority and cost are taken from the first match in the whole
+            # text, so look them up once rather than once per record
+            priority = None
+            for pattern in _PRIORITY_RES:
+                match = pattern.search(text)
+                if match:
+                    priority = match.group(1).lower()
+                    break
+            
+            cost_estimate = None
+            for pattern in _COST_RES:
+                match = pattern.search(text)
+                if match:
+                    cost_str = match.group(0).replace('$', '').replace(',', '')
+                    try:
+                        cost_estimate = float(cost_str)
+                    except ValueError:
+                        pass
+                    break
+            
             # Create one record per component or action (whichever is more)
             count = max(len(components), len(actions), 1)
             
-            for i in range(min(count, 10)):  # Limit to 10 records
-                record = {
+            for i in range(min(count, MAX_REGEX_RECORDS)):
+                records.append({
                     'component': components[i] if i < len(components) else None,
                     'maint_action': actions[i] if i < len(actions) else None,
-                    'priority': None,
+                    'priority': priority,
                     'system': None,
                     'failure_type': None,
                     'start_date': None,
                     'end_date': None,
-                    'cost_estimate': None,
+                    'cost_estimate': cost_estimate,
                     'summary_notes': None
-                }
-                
-                # Try to find associated priority
-                for pattern in patterns['priority']:
-                    match = re.search(pattern, text, re.IGNORECASE)
-                    if match:
-                        record['priority'] = match.group(1).lower()
-                        break
-                
-                # Try to find cost
-                for pattern in patterns['cost']:
-                    match = re.search(pattern, text)
-                    if match:
-                        cost_str = match.group(0).replace('$', '').replace(',', '')
-                        try:
-                            record['cost_estimate'] = float(cost_str)
-                        except ValueError:
-                            pass
-                        break
-                
-                records.append(record)
+                })
         
         return records
     
+    @staticmethod
+    def _first_matches(patterns: List[Any], text: str, limit: int) -> List[str]:
+        """Collect group 1 of each pattern's matches in order, up to limit in total."""
+        found = []
+        for pattern in patterns:
+            for match in pattern.finditer(text):
+                if len(found) >= limit:
+                    return found
+                found.append(match.group(1))
+        return found
+    
     def _validate_records(
         self, 
         records: List[Dict[str, Any]]
@@ -146,22 +283,25 @@ class LLMExtractor:
         validated = []
         
         for record in records:
+            # Only include if has at least component or action; checked
+            # first so rejected records skip the remaining field parsing
+            component = self._clean_string(record.get('component'))
+            maint_action = self._clean_string(record.get('maint_action'))
+            if not component and not maint_action:
+                continue
+            
             # Ensure all expected fields exist
-            clean_record = {
-                'component': self._clean_string(record.get('component')),
+            validated.append({
+                'component': component,
                 'system': self._clean_string(record.get('system')),
                 'failure_type': self._clean_string(record.get('failure_type')),
-                'maint_action': self._clean_string(record.get('maint_action')),
+                'maint_action': maint_action,
                 'priority': self._normalize_priority(record.get('priority')),
                 'start_date': self._parse_date(record.get('start_date')),
                 'end_date': self._parse_date(record.get('end_date')),
                 'cost_estimate': self._parse_number(record.get('cost_estimate')),
                 'summary_notes': self._clean_string(record.get('summary_notes'))
-            }
-            
-            # Only include if has at least component or action
-            if clean_record['component'] or clean_record['maint_action']:
-                validated.append(clean_record)
+            })
         
         return validated
     
@@ -176,41 +316,13 @@ class LLMExtractor:
         """Normalize priority to standard values."""
         if not value:
             return None
-        
-        v = str(value).lower().strip()
-        
-        if v in ['high', 'critical', 'urgent', '1', 'p1']:
-            return 'high'
-        elif v in ['medium', 'moderate', 'normal', '2', 'p2']:
-            return 'medium'
-        elif v in ['low', 'minor', 'routine', '3', 'p3']:
-            return 'low'
-        
-        return v if v != 'null' else None
+        return _normalize_priority_text(str(value))
     
     def _parse_date(self, value: Any) -> Optional[str]:
         """Parse and format date."""
         if not value:
             return None
-        
-        s = str(value).strip()
-        if s.lower() == 'null':
-            return None
-        
-        # Already in correct format
-        if re.match(r'^\d{4}-\d{2}-\d{2}$', s):
-            return s
-        
-        # Try common formats
-        formats = ['%m/%d/%Y', '%d/%m/%Y', '%Y/%m/%d', '%m-%d-%Y']
-        for fmt in formats:
-            try:
-                dt = datetime.strptime(s, fmt)
-                return dt.strftime('%Y-%m-%d')
-            except ValueError:
-                continue
-        
-        return None
+        return _parse_date_text(str(value))
     
     def _parse_number(self, value: Any) -> Optional[float]:
         """Parse numeric value."""
@@ -220,10 +332,8 @@ class LLMExtractor:
         if isinstance(value, (int, float)):
             return float(value)
         
-        try:
-            s = str(value).replace('$', '').replace(',', '').strip()
-            if s.lower() == 'null':
-                return None
-            return float(s)
-        except ValueError:
+        # Match before converting so junk values return without raising
+        s = str(value).replace('$', '').replace(',', '').strip()
+        if not _NUMBER_RE.match(s):
             return None
+        return float(s)
@@ -87,3 +87,46 @@ Provide a brief summary including:
 4. Recommended actions
 
 Keep the summary under 200 words."""
+
+
+ANALYSIS_SYSTEM_PROMPT = "You are a maintenance document analyst. Provide clear, actionable analysis."
+
+
+ANALYSIS_RECORD_LINE = "- Component: {component}, Priority: {priority}, Action: {action}, Status: {status}"
+
+
+ANALYSIS_TEMPLATES = {
+    "summary": """Summarize the following maintenance document and its records:
+
+Document: {filename}
+Records:
+{records}
+
+Provide a brief executive summary (3-5 sentences) covering:
+1. Total maintenance items
+2. Priority distribution
+3. Key concerns or patterns""",
+
+    "risks": """Analyze the following maintenance records for potential risks:
+
+Document: {filename}
+Records:
+{records}
+
+Identify:
+1. High-priority items requiring immediate attention
+2. Potential equipment failure risks
+3. Resource or scheduling concerns
+4. Recommended preventive actions""",
+
+    "priorities": """Prioritize the following maintenance items:
+
+Document: {filename}
+Records:
+{records}
+
+Provide a prioritized action list:
+1. Rank items by urgency
+2. Explain prioritization rationale
+3. Suggest optimal sequencing""",
+}
@@ -8,9 +8,14 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from db.database import engine, Base
+from db.database import engine, Base, upgrade_schema
 from api.routes import upload, documents, ingest, legacy, status, reports, ai
+from api.routes.ai import get_llm_client
+from llm.cache import close_response_cache
+from llm.client import open_http_client, close_http_client
+from ingestion.pdf_extractor import shutdown_pdf_pool
 from core.logging import get_logger
+from models.schemas import HealthResponse
 
 # Initialize logger
 logger = get_logger("main")
@@ -21,6 +26,8 @@ async def lifespan(app: FastAPI):
     """Application lifespan events."""
     # Startup: Create tables if they don't exist
     Base.metadata.create_all(bind=engine)
+    # Existing tables don't get new columns from create_all
+    upgrade_schema(engine)
     logger.info("Database tables initialized")
     
     # Log AI status on startup
@@ -29,9 +36,16 @@ async def lifespan(app: FastAPI):
     else:
         logger.warning("HF_TOKEN not set - AI features will be limited")
     
+    # Open the pooled LLM connection
+    await open_http_client()
+    app.state.llm_client = get_llm_client()
+    
     logger.info("MDIA Backend started successfully")
     yield
     # Shutdown: cleanup if needed
+    await close_http_client()
+    await close_response_cache()
+    shutdown_pdf_pool()
     logger.info("MDIA Backend shutting down")
 
 
@@ -61,7 +75,7 @@ app.include_router(reports.router, tags=["Reports"])
 app.include_router(ai.router, tags=["AI"])
 
 
-@app.get("/health")
+@app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint."""
     return {
@@ -6,7 +6,7 @@ from decimal import Decimal
 from typing import Optional, List
 from sqlalchemy import (
     Column, String, Integer, Boolean, Text, DateTime, Date,
-    Numeric, ForeignKey, TypeDecorator
+    Numeric, ForeignKey, Index, JSON, TypeDecorator
 )
 from sqlalchemy.orm import relationship
 
@@ -38,10 +38,12 @@ class Document(Base):
     filename = Column(String(255), nullable=False)
     file_type = Column(String(50), nullable=False)
     file_size = Column(Integer, nullable=False)
+    content_sha256 = Column(String(64), unique=True)
     upload_date = Column(DateTime(timezone=True), default=datetime.utcnow)
     processed = Column(Boolean, default=False)
     processing_status = Column(String(50), default="pending")
     raw_text = Column(Text)
+    column_mappings = Column(JSON)  # Legacy conversion: standard field -> source column
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
     updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -78,13 +80,22 @@ class ExtractedRecord(Base):
     status_updates = relationship("StatusUpdate", back_populates="record", cascade="all, delete-orphan")
 
 
+# Per-document listing newest first; also serves plain document_id lookups
+Index("idx_records_document_created", ExtractedRecord.document_id, ExtractedRecord.created_at.desc())
+Index("idx_records_status", ExtractedRecord.status)
+Index("idx_records_priority", ExtractedRecord.priority)
+# Per-document status/priority filters and breakdowns (record listing, summary, CAP)
+Index("idx_records_document_status", ExtractedRecord.document_id, ExtractedRecord.status)
+Index("idx_records_document_priority", ExtractedRecord.document_id, ExtractedRecord.priority)
+
+
 class Anomaly(Base):
     """Detected data quality anomaly."""
     __tablename__ = "anomalies"
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     record_id = Column(GUID(), ForeignKey("extracted_records.id", ondelete="CASCADE"))
-    document_id = Column(GUID(), ForeignKey("documents.id", ondelete="CASCADE"))
+    document_id = Column(GUID(), ForeignKey("documents.id", ondelete="CASCADE"), index=True)
     anomaly_type = Column(String(100), nullable=False)
     severity = Column(String(50), nullable=False)
     description = Column(Text, nullable=False)
@@ -114,3 +125,7 @@ class StatusUpdate(Base):
 
     # Relationships
     record = relationship("ExtractedRecord", back_populates="status_updates")
+
+
+# Record history is always read newest first
+Index("idx_status_updates_record_created", StatusUpdate.record_id, StatusUpdate.created_at.desc())
@@ -137,6 +137,12 @@ class LegacyConversionResult(BaseModel):
     message: str
 
 
+class LegacyConversionPending(BaseModel):
+    document_id: UUID
+    status: str
+    result_url: str
+
+
 # Report schemas
 class SummaryReport(BaseModel):
     document_id: UUID
@@ -154,3 +160,25 @@ class CAPReport(BaseModel):
     document_id: UUID
     generated_at: datetime
     markdown_content: str
+
+
+class CAPBatchRequest(BaseModel):
+    document_ids: List[UUID] = Field(..., min_length=1, max_length=50)
+
+
+# Simple acknowledgements
+class DeleteResponse(BaseModel):
+    message: str
+    id: UUID
+
+
+class IngestResponse(BaseModel):
+    message: str
+    document_id: UUID
+    status: str
+
+
+class HealthResponse(BaseModel):
+    status: str
+    service: str
+    version: str
@@ -1,13 +1,84 @@
 """Corrective Action Plan generator."""
 
+import asyncio
+import io
+import json
 from datetime import datetime
-from typing import List
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+from uuid import UUID
 from decimal import Decimal
+from sqlalchemy import Float, cast
 
 from models.models import Document, ExtractedRecord
-from llm.client import LLMClient
+from core.logging import get_logger
+from llm.cache import cached_generate, cached_generate_stream
+from llm.client import LLMClient, get_llm_client
 from llm.prompts import CAP_SYSTEM_PROMPT, CAP_USER_TEMPLATE
 
+logger = get_logger("reports.cap")
+
+# The prompt embeds every record, so any record change produces a new key
+CAP_CACHE_TTL = 24 * 60 * 60
+
+# LLM responses no longer than this are treated as failed generations
+MIN_LLM_CAP_CHARS = 100
+
+# Static fragments of the template CAP
+_CAP_HEADER = (
+    "# Corrective Action Plan\n\n"
+    "**Document:** {filename}\n"
+    "**Generated:** {generated}\n"
+    "**Total Items:** {total}\n\n"
+    "---\n\n"
+    "## Executive Summary\n\n"
+    "This Corrective Action Plan addresses {total} maintenance items "
+    "identified in the source document. The analysis identified "
+    "{high} high-priority items requiring immediate attention, "
+    "{medium} medium-priority items, and {low} "
+    "low-priority items for routine scheduling.\n\n"
+)
+_COST_TABLE_HEAD = (
+    "| Priority | Count | Estimated Cost |\n"
+    "|----------|-------|----------------|\n"
+)
+_TIMELINE_HEAD = (
+    "## Implementation Timeline\n\n"
+    "| Phase | Items | Target Duration |\n"
+    "|-------|-------|-----------------|\n"
+)
+_CAP_FOOTER = (
+    "---\n\n"
+    "*This Corrective Action Plan was generated by MDIA. "
+    "All recommendations should be reviewed by qualified engineering personnel "
+    "before implementation.*"
+)
+
+# The only record columns a CAP reads. Callers select these as plain rows
+# rather than loading ORM records; costs are cast to float by the database
+# instead of being built as Decimal objects and converted per row
+CAP_RECORD_COLUMNS = (
+    ExtractedRecord.component,
+    ExtractedRecord.system,
+    ExtractedRecord.failure_type,
+    ExtractedRecord.maint_action,
+    ExtractedRecord.priority,
+    ExtractedRecord.status,
+    ExtractedRecord.start_date,
+    ExtractedRecord.end_date,
+    cast(ExtractedRecord.cost_estimate, Float).label("cost_estimate"),
+    ExtractedRecord.summary_notes,
+)
+
+# C-accelerated serialization of the records payload when available
+try:
+    import orjson
+    
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    def _dumps(obj) -> str:
+        return json.dumps(obj, separators=(',', ':'))
+
 
 class CAPGenerator:
     """
@@ -16,20 +87,27 @@ class CAPGenerator:
     Falls back to template-based generation if LLM is unavailable.
     """
     
-    def __init__(self):
-        self.client = LLMClient()
+    def __init__(self, client: Optional[LLMClient] = None):
+        """
+        Initialize the CAP generator.
+        
+        Args:
+            client: LLM client to use; defaults to the shared singleton
+        """
+        self.client = client or get_llm_client()
     
     async def generate(
         self, 
         document: Document, 
-        records: List[ExtractedRecord]
+        records: Sequence[Any]
     ) -> str:
         """
         Generate a Corrective Action Plan.
         
         Args:
             document: Source document
-            records: Extracted maintenance records
+            records: Extracted maintenance records, as ORM objects or rows
+                selected with CAP_RECORD_COLUMNS
             
         Returns:
             Markdown-formatted CAP document
@@ -40,14 +118,17 @@ class CAPGenerator:
         # Try LLM generation
         try:
             prompt = CAP_USER_TEMPLATE.format(json_data=records_data)
-            response = await self.client.generate(
+            response, _ = await cached_generate(
+                self.client,
                 prompt=prompt,
                 system_prompt=CAP_SYSTEM_PROMPT,
+                namespace=f"cap:{document.id}",
+                ttl=CAP_CACHE_TTL,
                 max_tokens=4096,
                 temperature=0.3
             )
             
-            if response and len(response) > 100:
+            if response and len(response) > MIN_LLM_CAP_CHARS:
                 return response
         except Exception:
             pass  # Fall through to template generation
@@ -55,12 +136,85 @@ class CAPGenerator:
         # Fallback to template generation
         return self._generate_template_cap(document, records)
     
-    def _prepare_records_data(self, records: List[ExtractedRecord]) -> str:
-        """Convert records to JSON-like string for LLM."""
-        items = []
+    async def generate_batch(
+        self,
+        items: Sequence[Tuple[Document, Sequence[Any]]]
+    ) -> Dict[UUID, str]:
+        """
+        Generate Corrective Action Plans for several documents.
         
-        for r in records:
-            item = {
+        Plans are generated concurrently; the client's request semaphore
+        bounds how many LLM calls are in flight, and documents whose
+        records are unchanged are served from the response cache.
+        
+        Args:
+            items: (document, records) pairs
+            
+        Returns:
+            Markdown-formatted CAP per document id
+        """
+        plans = await asyncio.gather(
+            *[self.generate(document, records) for document, records in items]
+        )
+        return {document.id: plan for (document, _), plan in zip(items, plans)}
+    
+    async def generate_stream(
+        self,
+        document: Document,
+        records: Sequence[Any]
+    ) -> AsyncIterator[str]:
+        """
+        Stream a Corrective Action Plan as the LLM writes it.
+        
+        Output is held back until it is long enough to rule out a failed
+        generation, then forwarded chunk by chunk. If the LLM fails before
+        that point the template CAP is sent instead, as in generate();
+        a failure after it ends the stream early.
+        
+        Args:
+            document: Source document
+            records: Extracted maintenance records, as ORM objects or rows
+                selected with CAP_RECORD_COLUMNS
+            
+        Yields:
+            Markdown-formatted chunks of the CAP document
+        """
+        prompt = CAP_USER_TEMPLATE.format(json_data=self._prepare_records_data(records))
+        
+        head = []
+        head_len = 0
+        streaming = False
+        try:
+            async for chunk in cached_generate_stream(
+                self.client,
+                prompt=prompt,
+                system_prompt=CAP_SYSTEM_PROMPT,
+                namespace=f"cap:{document.id}",
+                ttl=CAP_CACHE_TTL,
+                max_tokens=4096,
+                temperature=0.3
+            ):
+                if streaming:
+                    yield chunk
+                    continue
+                head.append(chunk)
+                head_len += len(chunk)
+                if head_len > MIN_LLM_CAP_CHARS:
+                    streaming = True
+                    yield "".join(head)
+        except Exception as e:
+            if streaming:
+                logger.error(f"CAP stream interrupted: {type(e).__name__}: {e}")
+                return
+        
+        if not streaming:
+            # Fallback to template generation
+            yield self._generate_template_cap(document, records)
+    
+    def _prepare_records_data(self, records: Sequence[Any]) -> str:
+        """Serialize records to a JSON array for the LLM."""
+        items = [
+            {
                 'component': r.component,
                 'system': r.system,
                 'failure_type': r.failure_type,
@@ -72,169 +226,136 @@ class CAPGenerator:
                 'cost_estimate': float(r.cost_estimate) if r.cost_estimate else None,
                 'notes': r.summary_notes
             }
-            items.append(str(item))
+            for r in records
+        ]
         
-        return '\n'.join(items)
+        return _dumps(items)
     
     def _generate_template_cap(
         self, 
         document: Document, 
-        records: List[ExtractedRecord]
+        records: Sequence[Any]
     ) -> str:
         """Generate CAP using template (fallback)."""
-        # Calculate statistics
-        total_cost = sum(
-            float(r.cost_estimate) for r in records 
-            if r.cost_estimate
-        )
+        # Calculate statistics: bucket by priority and sum costs in one pass
+        buckets = {'high': [], 'medium': [], 'low': []}
+        bucket_costs = {'high': 0.0, 'medium': 0.0, 'low': 0.0}
+        total_cost = 0.0
         
-        high_priority = [r for r in records if r.priority == 'high']
-        medium_priority = [r for r in records if r.priority == 'medium']
-        low_priority = [r for r in records if r.priority == 'low']
-        
-        # Build markdown document
-        lines = [
-            "# Corrective Action Plan",
-            "",
-            f"**Document:** {document.filename}",
-            f"**Generated:** {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}",
-            f"**Total Items:** {len(records)}",
-            "",
-            "---",
-            "",
-            "## Executive Summary",
-            "",
-            f"This Corrective Action Plan addresses {len(records)} maintenance items "
-            f"identified in the source document. The analysis identified "
-            f"{len(high_priority)} high-priority items requiring immediate attention, "
-            f"{len(medium_priority)} medium-priority items, and {len(low_priority)} "
-            f"low-priority items for routine scheduling.",
-            "",
-        ]
+        for r in records:
+            cost = float(r.cost_estimate) if r.cost_estimate else 0.0
+            total_cost += cost
+            if r.priority in buckets:
+                buckets[r.priority].append(r)
+                bucket_costs[r.priority] += cost
+        
+        high_priority = buckets['high']
+        medium_priority = buckets['medium']
+        low_priority = buckets['low']
+        
+        # Build markdown document into one buffer; every write ends its line
+        buf = io.StringIO()
+        w = buf.write
+        
+        w(_CAP_HEADER.format_map({
+            'filename': document.filename,
+            'generated': datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC'),
+            'total': len(records),
+            'high': len(high_priority),
+            'medium': len(medium_priority),
+            'low': len(low_priority),
+        }))
         
         if total_cost > 0:
-            lines.extend([
-                f"**Estimated Total Cost:** ${total_cost:,.2f}",
-                "",
-            ])
+            w(f"**Estimated Total Cost:** ${total_cost:,.2f}\n\n")
         
         # Findings
-        lines.extend([
-            "## Findings",
-            "",
-        ])
+        w("## Findings\n\n")
         
         if high_priority:
-            lines.append("### High Priority Items")
-            lines.append("")
+            w("### High Priority Items\n\n")
             for i, r in enumerate(high_priority, 1):
-                lines.append(f"{i}. **{r.component or 'Unknown Component'}**")
+                w(f"{i}. **{r.component or 'Unknown Component'}**\n")
                 if r.maint_action:
-                    lines.append(f"   - Action: {r.maint_action}")
+                    w(f"   - Action: {r.maint_action}\n")
                 if r.failure_type:
-                    lines.append(f"   - Issue: {r.failure_type}")
-                lines.append("")
+                    w(f"   - Issue: {r.failure_type}\n")
+                w("\n")
         
         if medium_priority:
-            lines.append("### Medium Priority Items")
-            lines.append("")
+            w("### Medium Priority Items\n\n")
             for i, r in enumerate(medium_priority, 1):
-                lines.append(f"{i}. **{r.component or 'Unknown Component'}**")
+                w(f"{i}. **{r.component or 'Unknown Component'}**\n")
                 if r.maint_action:
-                    lines.append(f"   - Action: {r.maint_action}")
-                lines.append("")
+                    w(f"   - Action: {r.maint_action}\n")
+                w("\n")
         
         if low_priority:
-            lines.append("### Low Priority Items")
-            lines.append("")
+            w("### Low Priority Items\n\n")
             for i, r in enumerate(low_priority, 1):
-                lines.append(f"{i}. {r.component or 'Unknown Component'}")
-            lines.append("")
+                w(f"{i}. {r.component or 'Unknown Component'}\n")
+            w("\n")
         
         # Recommended Actions
-        lines.extend([
-            "## Recommended Corrective Actions",
-            "",
-        ])
+        w("## Recommended Corrective Actions\n\n")
         
         for i, r in enumerate(records, 1):
             if r.maint_action:
-                lines.append(f"{i}. {r.maint_action}")
-        lines.append("")
+                w(f"{i}. {r.maint_action}\n")
+        w("\n")
         
         # Cost Analysis
-        lines.extend([
-            "## Cost Analysis",
-            "",
-        ])
+        w("## Cost Analysis\n\n")
         
         if total_cost > 0:
-            lines.append("| Priority | Count | Estimated Cost |")
-            lines.append("|----------|-------|----------------|")
+            w(_COST_TABLE_HEAD)
             
             if high_priority:
-                high_cost = sum(float(r.cost_estimate) for r in high_priority if r.cost_estimate)
-                lines.append(f"| High | {len(high_priority)} | ${high_cost:,.2f} |")
+                w(f"| High | {len(high_priority)} | ${bucket_costs['high']:,.2f} |\n")
             if medium_priority:
-                med_cost = sum(float(r.cost_estimate) for r in medium_priority if r.cost_estimate)
-                lines.append(f"| Medium | {len(medium_priority)} | ${med_cost:,.2f} |")
+                w(f"| Medium | {len(medium_priority)} | ${bucket_costs['medium']:,.2f} |\n")
             if low_priority:
-                low_cost = sum(float(r.cost_estimate) for r in low_priority if r.cost_estimate)
-                lines.append(f"| Low | {len(low_priority)} | ${low_cost:,.2f} |")
+                w(f"| Low | {len(low_priority)} | ${bucket_costs['low']:,.2f} |\n")
             
-            lines.append(f"| **Total** | **{len(records)}** | **${total_cost:,.2f}** |")
+            w(f"| **Total** | **{len(records)}** | **${total_cost:,.2f}** |\n")
         else:
-            lines.append("Cost estimates not available from source document.")
+            w("Cost estimates not available from source document.\n")
         
-        lines.append("")
+        w("\n")
         
         # Priority Assessment
-        lines.extend([
-            "## Priority Assessment",
-            "",
-        ])
+        w("## Priority Assessment\n\n")
         
         if high_priority:
-            lines.append(
+            w(
                 f"**Overall Priority: HIGH** - {len(high_priority)} critical items "
-                "require immediate attention."
+                "require immediate attention.\n"
             )
         elif medium_priority:
-            lines.append(
+            w(
                 f"**Overall Priority: MEDIUM** - {len(medium_priority)} items "
-                "should be scheduled within the next maintenance window."
+                "should be scheduled within the next maintenance window.\n"
             )
         else:
-            lines.append(
+            w(
                 "**Overall Priority: LOW** - Items can be addressed during "
-                "routine maintenance cycles."
+                "routine maintenance cycles.\n"
             )
-        lines.append("")
+        w("\n")
         
         # Timeline
-        lines.extend([
-            "## Implementation Timeline",
-            "",
-            "| Phase | Items | Target Duration |",
-            "|-------|-------|-----------------|",
-        ])
+        w(_TIMELINE_HEAD)
         
         if high_priority:
-            lines.append(f"| Immediate | {len(high_priority)} | 1-2 weeks |")
+            w(f"| Immediate | {len(high_priority)} | 1-2 weeks |\n")
         if medium_priority:
-            lines.append(f"| Short-term | {len(medium_priority)} | 2-4 weeks |")
+            w(f"| Short-term | {len(medium_priority)} | 2-4 weeks |\n")
         if low_priority:
-            lines.append(f"| Scheduled | {len(low_priority)} | Next quarter |")
+            w(f"| Scheduled | {len(low_priority)} | Next quarter |\n")
         
-        lines.append("")
+        w("\n")
         
-        # Footer
-        lines.extend([
-            "---",
-            "",
-            "*This Corrective Action Plan was generated by MDIA. "
-            "All recommendations should be reviewed by qualified engineering personnel "
-            "before implementation.*",
-        ])
+        # Footer (last line, no trailing newline)
+        w(_CAP_FOOTER)
         
-        return '\n'.join(lines)
+        return buf.getvalue()
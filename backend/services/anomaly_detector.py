@@ -1,9 +1,91 @@
 """Anomaly detection service."""
 
-from typing import List, Dict, Any, Optional
+import numpy as np
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 from datetime import date, timedelta
 from decimal import Decimal
 
+# Fixed parts of each kind of anomaly; checks copy a template and add the
+# record-specific description and value
+_MISSING_FIELD_ANOMALIES = tuple(
+    (field, {
+        'anomaly_type': 'missing_field',
+        'severity': severity,
+        'description': message,
+        'field_name': field,
+        'field_value': None,
+        'suggested_fix': f'Review source document for {field} information'
+    })
+    for field, severity, message in (
+        ('component', 'high', 'Component identifier is required'),
+        ('priority', 'medium', 'Priority level should be assigned'),
+        ('maint_action', 'medium', 'Maintenance action should be described'),
+    )
+)
+_END_BEFORE_START = {
+    'anomaly_type': 'date_inconsistency',
+    'severity': 'high',
+    'field_name': 'end_date',
+    'suggested_fix': 'Verify and correct date sequence'
+}
+_LONG_DURATION = {
+    'anomaly_type': 'date_inconsistency',
+    'severity': 'low',
+    'field_name': 'duration',
+    'suggested_fix': 'Verify dates are correct or split into phases'
+}
+_FAR_FUTURE_END = {
+    'anomaly_type': 'date_inconsistency',
+    'severity': 'medium',
+    'field_name': 'end_date',
+    'suggested_fix': 'Verify projected completion date'
+}
+_NEGATIVE_COST = {
+    'anomaly_type': 'invalid_value',
+    'severity': 'high',
+    'field_name': 'cost_estimate',
+    'suggested_fix': 'Cost cannot be negative'
+}
+_EXTREME_COST = {
+    'anomaly_type': 'extreme_value',
+    'severity': 'high',
+    'field_name': 'cost_estimate',
+    'suggested_fix': 'Verify cost value or add justification'
+}
+_HIGH_COST = {
+    'anomaly_type': 'extreme_value',
+    'severity': 'medium',
+    'field_name': 'cost_estimate',
+    'suggested_fix': 'Verify cost estimate is accurate'
+}
+_UNPARSEABLE_COST = {
+    'anomaly_type': 'parse_error',
+    'severity': 'low',
+    'field_name': 'cost_estimate',
+    'suggested_fix': 'Convert to numeric format'
+}
+_NON_STANDARD_PRIORITY = {
+    'anomaly_type': 'invalid_value',
+    'severity': 'low',
+    'field_name': 'priority',
+    'suggested_fix': 'Use standard priority: high, medium, or low'
+}
+
+# Cost severity buckets produced by AnomalyDetector.classify_costs, indexing
+# _COST_BUCKETS; bucket 0 (in range or missing) has no anomaly
+COST_IN_RANGE, COST_NEGATIVE, COST_HIGH, COST_EXTREME = range(4)
+_COST_BUCKETS = (
+    None,
+    (_NEGATIVE_COST, 'Negative cost estimate'),
+    (_HIGH_COST, 'High cost estimate'),
+    (_EXTREME_COST, 'Extremely high cost estimate'),
+)
+
+
+def _lower(value: Any) -> str:
+    """Lowercase a field value, converting only values that are not already strings."""
+    return value.lower() if isinstance(value, str) else str(value).lower()
+
 
 class AnomalyDetector:
     """
@@ -21,6 +103,13 @@ class AnomalyDetector:
     COST_WARNING_THRESHOLD = 100000  # Flag costs over $100k
     COST_ERROR_THRESHOLD = 1000000   # Flag costs over $1M
     
+    __slots__ = ('_lower_cache',)
+    
+    def __init__(self):
+        # Lowercased known-value sets, keyed by id() of the caller's set; the
+        # original is kept alongside so a recycled id is never mistaken for it
+        self._lower_cache: Dict[int, Tuple[Any, frozenset]] = {}
+    
     def detect_anomalies(
         self, 
         record: Dict[str, Any],
@@ -38,16 +127,166 @@ class AnomalyDetector:
         Returns:
             List of detected anomalies
         """
+        return self._detect(
+            record,
+            self._check_dates(record, self._latest_end_date()),
+            self._check_cost(record),
+            known_components,
+            known_systems
+        )
+    
+    def detect_anomalies_batch(
+        self,
+        records: Sequence[Dict[str, Any]],
+        known_components: Optional[set] = None,
+        known_systems: Optional[set] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Detect anomalies in many records.
+        
+        Same results as detect_anomalies() per record, but date and cost
+        checks run for all records in one vectorized pass each.
+        
+        Args:
+            records: Record dictionaries to check
+            known_components: Optional set of known valid components
+            known_systems: Optional set of known valid systems
+            
+        Returns:
+            List of detected anomalies for each record, in order
+        """
+        date_anomalies = self.check_dates_batch(records, self._latest_end_date())
+        cost_anomalies = self.check_costs_batch([r.get('cost_estimate') for r in records])
+        return [
+            self._detect(
+                record,
+                date_anomalies.get(i, []),
+                cost_anomalies.get(i, []),
+                known_components,
+                known_systems
+            )
+            for i, record in enumerate(records)
+        ]
+    
+    def check_dates_batch(
+        self,
+        records: Sequence[Dict[str, Any]],
+        latest_end: date
+    ) -> Dict[int, List[Dict]]:
+        """
+        Check the date fields of many records at once.
+        
+        Records with both dates are gathered into datetime64 arrays and
+        compared as whole columns; anomaly dicts are built only for the
+        flagged positions.
+        
+        Args:
+            records: Record dictionaries to check
+            latest_end: Latest end date not flagged as too far in the future
+            
+        Returns:
+            Anomalies keyed by position, for flagged positions only
+        """
+        positions, starts, ends = [], [], []
+        for i, record in enumerate(records):
+            pair = self._date_pair(record)
+            if pair:
+                positions.append(i)
+                starts.append(pair[0])
+                ends.append(pair[1])
+        if not positions:
+            return {}
+        
+        start_days = np.array(starts, dtype='datetime64[D]')
+        end_days = np.array(ends, dtype='datetime64[D]')
+        durations = (end_days - start_days).astype(np.int64)
+        flagged = (
+            (durations < 0)
+            | (durations > 365)
+            | (end_days > np.datetime64(latest_end, 'D'))
+        )
+        
+        return {
+            positions[j]: self._date_anomalies(starts[j], ends[j], latest_end)
+            for j in np.flatnonzero(flagged).tolist()
+        }
+    
+    def check_costs_batch(self, costs: Sequence[Any]) -> Dict[int, List[Dict]]:
+        """
+        Check many cost values against the thresholds at once.
+        
+        Costs are converted to one float array (NaN for missing) and
+        classified with array comparisons; anomaly dicts are built only
+        for the flagged positions.
+        
+        Args:
+            costs: Cost values, None where missing
+            
+        Returns:
+            Anomalies keyed by position, for flagged positions only
+        """
+        unparseable = []
+        try:
+            values = np.array([np.nan if c is None else c for c in costs], dtype=np.float64)
+        except (ValueError, TypeError):
+            # Some value is not numeric; convert one by one to find which
+            values = np.full(len(costs), np.nan)
+            for i, cost in enumerate(costs):
+                if cost is None:
+                    continue
+                try:
+                    values[i] = float(cost)
+                except (ValueError, TypeError):
+                    unparseable.append(i)
+        
+        buckets = self.classify_costs(values)
+        
+        anomalies = {i: [self._cost_parse_error(costs[i])] for i in unparseable}
+        for i in np.flatnonzero(buckets).tolist():
+            anomalies[i] = [self._bucket_anomaly(int(buckets[i]), float(values[i]))]
+        return anomalies
+    
+    def classify_costs(self, values: np.ndarray) -> np.ndarray:
+        """
+        Bucket cost values by severity without a per-value branch.
+        
+        Args:
+            values: Float costs, NaN where missing
+            
+        Returns:
+            Array of COST_IN_RANGE, COST_NEGATIVE, COST_HIGH or COST_EXTREME
+        """
+        # Conditions are checked in order and NaN compares false, so
+        # missing costs fall through to COST_IN_RANGE
+        return np.select(
+            [
+                values < 0,
+                values > self.COST_ERROR_THRESHOLD,
+                values > self.COST_WARNING_THRESHOLD,
+            ],
+            [COST_NEGATIVE, COST_EXTREME, COST_HIGH],
+            default=COST_IN_RANGE
+        )
+    
+    def _detect(
+        self,
+        record: Dict[str, Any],
+        date_anomalies: List[Dict],
+        cost_anomalies: List[Dict],
+        known_components: Optional[set],
+        known_systems: Optional[set]
+    ) -> List[Dict[str, Any]]:
+        """Run the per-record checks, slotting in already computed date and cost anomalies."""
         anomalies = []
         
         # Check for missing critical fields
         anomalies.extend(self._check_missing_fields(record))
         
         # Check date consistency
-        anomalies.extend(self._check_dates(record))
+        anomalies.extend(date_anomalies)
         
         # Check cost values
-        anomalies.extend(self._check_cost(record))
+        anomalies.extend(cost_anomalies)
         
         # Check priority validity
         anomalies.extend(self._check_priority(record))
@@ -71,147 +310,138 @@ class AnomalyDetector:
     
     def _check_missing_fields(self, record: Dict[str, Any]) -> List[Dict]:
         """Check for missing critical fields."""
-        anomalies = []
-        
-        critical_fields = [
-            ('component', 'high', 'Component identifier is required'),
-            ('priority', 'medium', 'Priority level should be assigned'),
-            ('maint_action', 'medium', 'Maintenance action should be described'),
+        return [
+            dict(anomaly) for field, anomaly in _MISSING_FIELD_ANOMALIES
+            if not record.get(field)
         ]
+    
+    def _check_dates(self, record: Dict[str, Any], latest_end: date) -> List[Dict]:
+        """Check date field consistency; end dates after latest_end are flagged."""
+        pair = self._date_pair(record)
+        if not pair:
+            return []
+        return self._date_anomalies(pair[0], pair[1], latest_end)
+    
+    def _date_pair(self, record: Dict[str, Any]) -> Optional[Tuple[date, date]]:
+        """Start and end dates of a record, or None unless both are usable."""
+        start_date = record.get('start_date')
+        end_date = record.get('end_date')
+        if not (start_date and end_date):
+            return None
         
-        for field, severity, message in critical_fields:
-            if not record.get(field):
-                anomalies.append({
-                    'anomaly_type': 'missing_field',
-                    'severity': severity,
-                    'description': message,
-                    'field_name': field,
-                    'field_value': None,
-                    'suggested_fix': f'Review source document for {field} information'
-                })
+        # The pipeline passes records through DataNormalizer first, so
+        # dates are usually date objects already; only raw records
+        # need their ISO strings parsed here
+        if not isinstance(start_date, date):
+            start_date = self._as_date(start_date)
+        if not isinstance(end_date, date):
+            end_date = self._as_date(end_date)
         
-        return anomalies
+        if start_date and end_date:
+            return start_date, end_date
+        return None
     
-    def _check_dates(self, record: Dict[str, Any]) -> List[Dict]:
-        """Check date field consistency."""
+    def _date_anomalies(self, start_date: date, end_date: date, latest_end: date) -> List[Dict]:
+        """Build the anomalies for a start/end date pair."""
         anomalies = []
         
-        start_date = record.get('start_date')
-        end_date = record.get('end_date')
+        # Check if end is before start
+        if end_date < start_date:
+            anomalies.append({
+                **_END_BEFORE_START,
+                'description': f'End date ({end_date}) is before start date ({start_date})',
+                'field_value': str(end_date)
+            })
         
-        if start_date and end_date:
-            # Convert to date objects if strings
-            if isinstance(start_date, str):
-                try:
-                    start_date = date.fromisoformat(start_date)
-                except ValueError:
-                    start_date = None
-            
-            if isinstance(end_date, str):
-                try:
-                    end_date = date.fromisoformat(end_date)
-                except ValueError:
-                    end_date = None
-            
-            if start_date and end_date:
-                # Check if end is before start
-                if end_date < start_date:
-                    anomalies.append({
-                        'anomaly_type': 'date_inconsistency',
-                        'severity': 'high',
-                        'description': f'End date ({end_date}) is before start date ({start_date})',
-                        'field_name': 'end_date',
-                        'field_value': str(end_date),
-                        'suggested_fix': 'Verify and correct date sequence'
-                    })
-                
-                # Check for unusually long duration (over 1 year)
-                duration = (end_date - start_date).days
-                if duration > 365:
-                    anomalies.append({
-                        'anomaly_type': 'date_inconsistency',
-                        'severity': 'low',
-                        'description': f'Maintenance duration ({duration} days) exceeds 1 year',
-                        'field_name': 'duration',
-                        'field_value': str(duration),
-                        'suggested_fix': 'Verify dates are correct or split into phases'
-                    })
-                
-                # Check for future dates
-                today = date.today()
-                if end_date > today + timedelta(days=365):
-                    anomalies.append({
-                        'anomaly_type': 'date_inconsistency',
-                        'severity': 'medium',
-                        'description': f'End date ({end_date}) is more than 1 year in the future',
-                        'field_name': 'end_date',
-                        'field_value': str(end_date),
-                        'suggested_fix': 'Verify projected completion date'
-                    })
+        # Check for unusually long duration (over 1 year)
+        duration = (end_date - start_date).days
+        if duration > 365:
+            anomalies.append({
+                **_LONG_DURATION,
+                'description': f'Maintenance duration ({duration} days) exceeds 1 year',
+                'field_value': str(duration)
+            })
+        
+        # Check for future dates
+        if end_date > latest_end:
+            anomalies.append({
+                **_FAR_FUTURE_END,
+                'description': f'End date ({end_date}) is more than 1 year in the future',
+                'field_value': str(end_date)
+            })
         
         return anomalies
     
+    @staticmethod
+    def _latest_end_date() -> date:
+        """Latest end date not flagged as too far in the future (1 year out)."""
+        return date.today() + timedelta(days=365)
+    
+    @staticmethod
+    def _as_date(value: Any) -> Optional[date]:
+        """Parse an ISO date string, or None if it is not one."""
+        # Every ISO layout starts with a four-digit year; checking that first
+        # keeps free-text dates from raising and catching ValueError
+        if not isinstance(value, str) or not value[:4].isdigit():
+            return None
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            return None
+    
     def _check_cost(self, record: Dict[str, Any]) -> List[Dict]:
         """Check cost estimate values."""
-        anomalies = []
-        
         cost = record.get('cost_estimate')
-        if cost is not None:
-            try:
-                cost_val = float(cost)
-                
-                if cost_val < 0:
-                    anomalies.append({
-                        'anomaly_type': 'invalid_value',
-                        'severity': 'high',
-                        'description': f'Negative cost estimate: ${cost_val:,.2f}',
-                        'field_name': 'cost_estimate',
-                        'field_value': str(cost_val),
-                        'suggested_fix': 'Cost cannot be negative'
-                    })
-                elif cost_val > self.COST_ERROR_THRESHOLD:
-                    anomalies.append({
-                        'anomaly_type': 'extreme_value',
-                        'severity': 'high',
-                        'description': f'Extremely high cost estimate: ${cost_val:,.2f}',
-                        'field_name': 'cost_estimate',
-                        'field_value': str(cost_val),
-                        'suggested_fix': 'Verify cost value or add justification'
-                    })
-                elif cost_val > self.COST_WARNING_THRESHOLD:
-                    anomalies.append({
-                        'anomaly_type': 'extreme_value',
-                        'severity': 'medium',
-                        'description': f'High cost estimate: ${cost_val:,.2f}',
-                        'field_name': 'cost_estimate',
-                        'field_value': str(cost_val),
-                        'suggested_fix': 'Verify cost estimate is accurate'
-                    })
-            except (ValueError, TypeError):
-                anomalies.append({
-                    'anomaly_type': 'parse_error',
-                    'severity': 'low',
-                    'description': f'Could not parse cost value: {cost}',
-                    'field_name': 'cost_estimate',
-                    'field_value': str(cost),
-                    'suggested_fix': 'Convert to numeric format'
-                })
+        if cost is None:
+            return []
         
-        return anomalies
+        try:
+            cost_val = float(cost)
+        except (ValueError, TypeError):
+            return [self._cost_parse_error(cost)]
+        
+        anomaly = self._cost_anomaly(cost_val)
+        return [anomaly] if anomaly else []
+    
+    def _cost_anomaly(self, cost_val: float) -> Optional[Dict]:
+        """Build the anomaly for a cost outside the accepted range, if any."""
+        if cost_val < 0:
+            bucket = COST_NEGATIVE
+        elif cost_val > self.COST_ERROR_THRESHOLD:
+            bucket = COST_EXTREME
+        elif cost_val > self.COST_WARNING_THRESHOLD:
+            bucket = COST_HIGH
+        else:
+            return None
+        return self._bucket_anomaly(bucket, cost_val)
+    
+    def _bucket_anomaly(self, bucket: int, cost_val: float) -> Dict:
+        """Build the anomaly for a cost in a flagged severity bucket."""
+        template, label = _COST_BUCKETS[bucket]
+        return {
+            **template,
+            'description': f'{label}: ${cost_val:,.2f}',
+            'field_value': str(cost_val)
+        }
+    
+    def _cost_parse_error(self, cost: Any) -> Dict:
+        """Build the anomaly for a cost that is not numeric."""
+        return {
+            **_UNPARSEABLE_COST,
+            'description': f'Could not parse cost value: {cost}',
+            'field_value': str(cost)
+        }
     
     def _check_priority(self, record: Dict[str, Any]) -> List[Dict]:
         """Check priority value validity."""
         anomalies = []
         
         priority = record.get('priority')
-        if priority and str(priority).lower() not in self.VALID_PRIORITIES:
+        if priority and _lower(priority) not in self.VALID_PRIORITIES:
             anomalies.append({
-                'anomaly_type': 'invalid_value',
-                'severity': 'low',
+                **_NON_STANDARD_PRIORITY,
                 'description': f'Non-standard priority value: {priority}',
-                'field_name': 'priority',
-                'field_value': str(priority),
-                'suggested_fix': 'Use standard priority: high, medium, or low'
+                'field_value': str(priority)
             })
         
         return anomalies
@@ -226,7 +456,7 @@ class AnomalyDetector:
         anomalies = []
         
         value = record.get(field)
-        if value and str(value).lower() not in {v.lower() for v in known_values}:
+        if value and _lower(value) not in self._lowered(known_values):
             anomalies.append({
                 'anomaly_type': 'unknown_value',
                 'severity': 'low',
@@ -237,3 +467,16 @@ class AnomalyDetector:
             })
         
         return anomalies
+    
+    def _lowered(self, known_values: set) -> frozenset:
+        """
+        Lowercase a known-values set once rather than once per record.
+        
+        The same set is passed for every record of a document, so it is
+        treated as unchanged for as long as this detector is in use.
+        """
+        cached = self._lower_cache.get(id(known_values))
+        if cached is None or cached[0] is not known_values:
+            cached = (known_values, frozenset(v.lower() for v in known_values))
+            self._lower_cache[id(known_values)] = cached
+        return cached[1]
@@ -5,25 +5,71 @@ from datetime import datetime, date
 from typing import Any, Optional, Dict
 from decimal import Decimal, InvalidOperation
 
+# Characters stripped from cost strings before parsing
+_COST_CLEAN_RE = re.compile(r'[^\d.\-]')
+# All-caps/digit tokens such as "A-101" that keep their case
+_IDENTIFIER_RE = re.compile(r'^[A-Z0-9\-]+$')
+
+# Numeric date layouts, each with the (year, month, day) group orders to try;
+# ambiguous slash/dash dates are month-first, then day-first
+_NUMERIC_DATE_RES = (
+    (re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})$'), ((1, 2, 3),)),
+    (re.compile(r'^(\d{1,2})/(\d{1,2})/(\d{4})$'), ((3, 1, 2), (3, 2, 1))),
+    (re.compile(r'^(\d{4})/(\d{1,2})/(\d{1,2})$'), ((1, 2, 3),)),
+    (re.compile(r'^(\d{1,2})-(\d{1,2})-(\d{4})$'), ((3, 1, 2), (3, 2, 1))),
+    (re.compile(r'^(\d{4})(\d{2})(\d{2})$'), ((1, 2, 3),)),
+)
+# "January 5, 2024" / "Jan 5, 2024"
+_MONTH_NAME_DATE_RE = re.compile(r'^([A-Za-z]{3,9}) (\d{1,2}), (\d{4})$')
+_MONTH_NAMES = (
+    'january', 'february', 'march', 'april', 'may', 'june',
+    'july', 'august', 'september', 'october', 'november', 'december',
+)
+# Full and three-letter month names (lowercased) to month numbers
+_MONTH_NUMBERS = {
+    **{name: i for i, name in enumerate(_MONTH_NAMES, 1)},
+    **{name[:3]: i for i, name in enumerate(_MONTH_NAMES, 1)},
+}
+
 
 class DataNormalizer:
     """Normalize extracted data to standard formats."""
     
-    # Standard priority mappings
+    # Stateless: all configuration lives on the class
+    __slots__ = ()
+    
+    # Standard priority mappings; standard values map to themselves so
+    # exact labels resolve with a single lookup
     PRIORITY_MAP = {
+        'high': 'high', 'medium': 'medium', 'low': 'low',
         '1': 'high', 'p1': 'high', 'critical': 'high', 'urgent': 'high',
         '2': 'medium', 'p2': 'medium', 'moderate': 'medium', 'normal': 'medium',
         '3': 'low', 'p3': 'low', 'minor': 'low', 'routine': 'low',
     }
     
-    # Standard status mappings
+    # Keywords for best-guess priority of free-text labels, one alternation
+    # per priority so each is a single scan; checked in order, matching
+    # anywhere in the label
+    PRIORITY_KEYWORDS = (
+        ('high', re.compile('high|critical|urgent|emergency')),
+        ('medium', re.compile('medium|moderate|normal')),
+        ('low', re.compile('low|minor|routine')),
+    )
+    
+    # Standard status mappings, including the standard values themselves
     STATUS_MAP = {
+        'open': 'open', 'in-progress': 'in-progress',
+        'awaiting-parts': 'awaiting-parts', 'complete': 'complete',
         'new': 'open', 'pending': 'open', 'created': 'open',
         'started': 'in-progress', 'working': 'in-progress', 'active': 'in-progress',
         'waiting': 'awaiting-parts', 'hold': 'awaiting-parts', 'blocked': 'awaiting-parts',
         'done': 'complete', 'finished': 'complete', 'closed': 'complete',
     }
     
+    # Null-like placeholders in source data (lowercased)
+    NULL_VALUES = frozenset(('null', 'none', 'n/a', ''))
+    NULL_STRINGS = NULL_VALUES | {'na'}
+    
     def normalize_record(self, record: Dict[str, Any]) -> Dict[str, Any]:
         """
         Normalize all fields in a record.
@@ -52,16 +98,15 @@ class DataNormalizer:
         if value is None:
             return None
         
-        s = str(value).strip()
+        # Collapse whitespace (which also trims the ends) in one pass; the
+        # empty string is one of the null-like values
+        s = ' '.join(str(value).split())
         
         # Handle null-like values
-        if s.lower() in ['null', 'none', 'n/a', 'na', '']:
+        if s.lower() in self.NULL_STRINGS:
             return None
         
-        # Remove excessive whitespace
-        s = ' '.join(s.split())
-        
-        return s if s else None
+        return s
     
     def normalize_priority(self, value: Any) -> Optional[str]:
         """Normalize priority to standard values: high, medium, low."""
@@ -70,21 +115,15 @@ class DataNormalizer:
         
         s = str(value).lower().strip()
         
-        # Direct match
-        if s in ['high', 'medium', 'low']:
-            return s
-        
-        # Mapped match
-        if s in self.PRIORITY_MAP:
-            return self.PRIORITY_MAP[s]
+        # Direct or mapped match
+        priority = self.PRIORITY_MAP.get(s)
+        if priority is not None:
+            return priority
         
         # Best guess based on keywords
-        if any(k in s for k in ['high', 'critical', 'urgent', 'emergency']):
-            return 'high'
-        if any(k in s for k in ['medium', 'moderate', 'normal']):
-            return 'medium'
-        if any(k in s for k in ['low', 'minor', 'routine']):
-            return 'low'
+        for priority, keywords in self.PRIORITY_KEYWORDS:
+            if keywords.search(s):
+                return priority
         
         return None
     
@@ -95,15 +134,8 @@ class DataNormalizer:
         
         s = str(value).lower().strip()
         
-        # Direct match
-        if s in ['open', 'in-progress', 'awaiting-parts', 'complete']:
-            return s
-        
-        # Mapped match
-        if s in self.STATUS_MAP:
-            return self.STATUS_MAP[s]
-        
-        return 'open'
+        # Direct or mapped match
+        return self.STATUS_MAP.get(s, 'open')
     
     def normalize_date(self, value: Any) -> Optional[date]:
         """Normalize date to date object."""
@@ -119,27 +151,29 @@ class DataNormalizer:
         
         s = str(value).strip()
         
-        if s.lower() in ['null', 'none', 'n/a', '']:
+        if s.lower() in self.NULL_VALUES:
             return None
         
-        # Try various date formats
-        formats = [
-            '%Y-%m-%d',
-            '%m/%d/%Y',
-            '%d/%m/%Y',
-            '%Y/%m/%d',
-            '%m-%d-%Y',
-            '%d-%m-%Y',
-            '%Y%m%d',
-            '%B %d, %Y',
-            '%b %d, %Y',
-        ]
-        
-        for fmt in formats:
-            try:
-                return datetime.strptime(s, fmt).date()
-            except ValueError:
-                continue
+        # Classify the layout by shape and build the date from its groups,
+        # rather than trying every strptime format and catching failures
+        for pattern, orders in _NUMERIC_DATE_RES:
+            match = pattern.match(s)
+            if match:
+                for y, m, d in orders:
+                    try:
+                        return date(int(match[y]), int(match[m]), int(match[d]))
+                    except ValueError:
+                        continue
+                return None
+        
+        match = _MONTH_NAME_DATE_RE.match(s)
+        if match:
+            month = _MONTH_NUMBERS.get(match[1].lower())
+            if month is not None:
+                try:
+                    return date(int(match[3]), month, int(match[2]))
+                except ValueError:
+                    pass
         
         return None
     
@@ -151,16 +185,21 @@ class DataNormalizer:
         if isinstance(value, Decimal):
             return value
         
-        if isinstance(value, (int, float)):
-            return Decimal(str(value))
+        # Integers convert exactly without formatting; floats go through
+        # their shortest repr so 0.1 stays 0.1 rather than its binary expansion
+        if isinstance(value, int):
+            return Decimal(value)
+        
+        if isinstance(value, float):
+            return Decimal(repr(value))
         
         s = str(value).strip()
         
-        if s.lower() in ['null', 'none', 'n/a', '']:
+        if s.lower() in self.NULL_VALUES:
             return None
         
         # Remove currency symbols and formatting
-        s = re.sub(r'[^\d.\-]', '', s)
+        s = _COST_CLEAN_RE.sub('', s)
         
         try:
             return Decimal(s)
@@ -187,7 +226,7 @@ class DataNormalizer:
         
         for part in parts:
             # If it looks like an identifier, preserve case
-            if re.match(r'^[A-Z0-9\-]+$', part):
+            if _IDENTIFIER_RE.match(part):
                 normalized.append(part)
             else:
                 normalized.append(part.capitalize())
@@ -1,13 +1,17 @@
 """Complete document ingestion pipeline."""
 
+import asyncio
 import os
+import uuid
 from uuid import UUID
-from typing import Optional
+from typing import Any, Dict, List, Optional
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from models.models import Document, ExtractedRecord, Anomaly
 from ingestion.pdf_extractor import PDFExtractor
 from ingestion.excel_extractor import ExcelExtractor
+from llm.client import LLMClient
 from llm.extractor import LLMExtractor
 from services.normalizer import DataNormalizer
 from services.anomaly_detector import AnomalyDetector
@@ -15,6 +19,20 @@ from services.anomaly_detector import AnomalyDetector
 
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(os.path.dirname(__file__), "..", "uploads"))
 
+# Extensions assumed for stored files whose original name had none
+_EXTENSION_BY_FILE_TYPE = {
+    'pdf': '.pdf',
+    'excel': '.xlsx',
+    'csv': '.csv',
+    'text': '.txt',
+    'log': '.log'
+}
+
+# Stateless helpers shared by every pipeline
+_pdf_extractor = PDFExtractor()
+_excel_extractor = ExcelExtractor()
+_normalizer = DataNormalizer()
+
 
 class IngestionPipeline:
     """
@@ -28,18 +46,23 @@ class IngestionPipeline:
     5. Store records in database
     """
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, llm_client: Optional[LLMClient] = None):
         self.db = db
-        self.pdf_extractor = PDFExtractor()
-        self.excel_extractor = ExcelExtractor()
-        self.llm_extractor = LLMExtractor()
-        self.normalizer = DataNormalizer()
+        self.pdf_extractor = _pdf_extractor
+        self.excel_extractor = _excel_extractor
+        self.llm_extractor = LLMExtractor(llm_client)
+        self.normalizer = _normalizer
+        # Per pipeline: its lowered known-value cache assumes the sets don't
+        # change while it is in use, which holds for one document
         self.anomaly_detector = AnomalyDetector()
     
     async def process_document(self, document_id: UUID) -> bool:
         """
         Process a document through the full pipeline.
         
+        Database access and text extraction are blocking, so they run in
+        worker threads; only the LLM calls run on the event loop.
+        
         Args:
             document_id: UUID of the document to process
             
@@ -47,100 +70,118 @@ class IngestionPipeline:
             True if processing succeeded
         """
         # Get document
-        document = self.db.query(Document).filter(
-            Document.id == document_id
-        ).first()
+        document = await asyncio.to_thread(self._load_document, document_id)
         
         if not document:
             return False
         
         try:
             # Step 1: Extract raw text
-            raw_text = await self._extract_text(document)
+            raw_text = await asyncio.to_thread(self._extract_text, document)
             document.raw_text = raw_text
             
             # Step 2: LLM extraction
             records_data = await self.llm_extractor.extract_records(raw_text)
             
-            # Step 3 & 4: Normalize and detect anomalies for each record
-            for record_data in records_data:
-                # Normalize
-                normalized = self.normalizer.normalize_record(record_data)
-                
-                # Create record
-                record = ExtractedRecord(
-                    document_id=document.id,
-                    component=normalized.get('component'),
-                    system=normalized.get('system'),
-                    failure_type=normalized.get('failure_type'),
-                    maint_action=normalized.get('maint_action'),
-                    priority=normalized.get('priority'),
-                    start_date=normalized.get('start_date'),
-                    end_date=normalized.get('end_date'),
-                    cost_estimate=normalized.get('cost_estimate'),
-                    summary_notes=normalized.get('summary_notes'),
-                    status='open',
-                    extraction_method='llm' if records_data else 'regex',
-                    confidence_score=0.85
-                )
-                self.db.add(record)
-                self.db.flush()
-                
-                # Detect anomalies
-                anomalies = self.anomaly_detector.detect_anomalies(normalized)
-                
-                for anomaly_data in anomalies:
-                    anomaly = Anomaly(
-                        record_id=record.id,
-                        document_id=document.id,
-                        anomaly_type=anomaly_data['anomaly_type'],
-                        severity=anomaly_data['severity'],
-                        description=anomaly_data['description'],
-                        field_name=anomaly_data.get('field_name'),
-                        field_value=anomaly_data.get('field_value'),
-                        suggested_fix=anomaly_data.get('suggested_fix')
-                    )
-                    self.db.add(anomaly)
-            
-            # Update document status
-            document.processed = True
-            document.processing_status = 'complete'
-            
-            self.db.commit()
+            # Steps 3-5: Normalize, detect anomalies and store
+            await asyncio.to_thread(self._store_records, document, records_data)
             return True
             
         except Exception as e:
             document.processing_status = f'error: {str(e)[:100]}'
-            self.db.commit()
+            await asyncio.to_thread(self.db.commit)
             raise
     
-    async def _extract_text(self, document: Document) -> str:
-        """Extract raw text based on file type."""
+    def _load_document(self, document_id: UUID) -> Optional[Document]:
+        """Fetch the document to process (blocking)."""
+        return self.db.query(Document).filter(
+            Document.id == document_id
+        ).first()
+    
+    def _store_records(self, document: Document, records_data: List[Dict[str, Any]]) -> None:
+        """Normalize records, detect anomalies and commit them with the document (blocking)."""
+        # Record ids are generated here so anomalies can reference their
+        # record without a flush per row
+        record_rows = []
+        anomaly_rows = []
+        
+        # Normalize
+        normalized_records = [self.normalizer.normalize_record(r) for r in records_data]
+        
+        # Detect anomalies for the whole document at once
+        record_anomalies = self.anomaly_detector.detect_anomalies_batch(normalized_records)
+        
+        for normalized, anomalies in zip(normalized_records, record_anomalies):
+            # Create record
+            record_id = uuid.uuid4()
+            record_rows.append({
+                'id': record_id,
+                'document_id': document.id,
+                'component': normalized.get('component'),
+                'system': normalized.get('system'),
+                'failure_type': normalized.get('failure_type'),
+                'maint_action': normalized.get('maint_action'),
+                'priority': normalized.get('priority'),
+                'start_date': normalized.get('start_date'),
+                'end_date': normalized.get('end_date'),
+                'cost_estimate': normalized.get('cost_estimate'),
+                'summary_notes': normalized.get('summary_notes'),
+                'status': 'open',
+                'extraction_method': 'llm' if records_data else 'regex',
+                'confidence_score': 0.85
+            })
+            
+            for anomaly_data in anomalies:
+                anomaly_rows.append({
+                    'id': uuid.uuid4(),
+                    'record_id': record_id,
+                    'document_id': document.id,
+                    'anomaly_type': anomaly_data['anomaly_type'],
+                    'severity': anomaly_data['severity'],
+                    'description': anomaly_data['description'],
+                    'field_name': anomaly_data.get('field_name'),
+                    'field_value': anomaly_data.get('field_value'),
+                    'suggested_fix': anomaly_data.get('suggested_fix')
+                })
+        
+        # One executemany per table instead of a round-trip per row
+        if record_rows:
+            self.db.execute(insert(ExtractedRecord), record_rows)
+        if anomaly_rows:
+            self.db.execute(insert(Anomaly), anomaly_rows)
+        
+        # Update document status
+        document.processed = True
+        document.processing_status = 'complete'
+        
+        self.db.commit()
+    
+    def _extract_text(self, document: Document) -> str:
+        """Extract raw text based on file type (blocking)."""
         file_path = os.path.join(UPLOAD_DIR, f"{document.id}{self._get_extension(document)}")
         
         if document.file_type == 'pdf':
             return self.pdf_extractor.extract_text(file_path)
         
-        elif document.file_type in ['excel', 'csv']:
+        elif document.file_type == 'csv':
+            # Stream large CSVs instead of materializing the whole frame
+            return self.excel_extractor.extract_csv_text(file_path)
+        
+        elif document.file_type == 'excel':
             df = self.excel_extractor.extract_dataframe(file_path)
             return self.excel_extractor.extract_text_representation(df)
         
         elif document.file_type in ['text', 'log']:
-            with open(file_path, 'r', errors='ignore') as f:
-                return f.read()
+            # One binary read and one decode instead of the buffered text
+            # layer; newlines are translated as text mode would
+            with open(file_path, 'rb') as f:
+                text = f.read().decode('utf-8', errors='ignore')
+            return text.replace('\r\n', '\n').replace('\r', '\n')
         
         return ""
     
     def _get_extension(self, document: Document) -> str:
         """Get file extension from filename."""
-        if '.' in document.filename:
-            return '.' + document.filename.rsplit('.', 1)[1].lower()
-        
-        ext_map = {
-            'pdf': '.pdf',
-            'excel': '.xlsx',
-            'csv': '.csv',
-            'text': '.txt',
-            'log': '.log'
-        }
-        return ext_map.get(document.file_type, '.txt')
+        # Same splitext rule the upload routes use when saving the file
+        ext = os.path.splitext(document.filename)[1].lower()
+        return ext or _EXTENSION_BY_FILE_TYPE.get(document.file_type, '.txt')
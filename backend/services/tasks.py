@@ -0,0 +1,67 @@
+"""Background jobs for document ingestion and legacy conversion."""
+
+import asyncio
+from uuid import UUID
+
+from core.celery_app import celery_app
+from core.logging import get_logger
+from db.database import SessionLocal
+from ingestion.legacy_converter import LegacyConverter
+from llm.cache import get_response_cache, close_response_cache
+from llm.client import open_http_client, close_http_client
+from models.models import Document
+from services.pipeline import IngestionPipeline
+
+logger = get_logger("tasks")
+
+
+async def run_ingestion_pipeline(document_id: UUID):
+    """Run the ingestion pipeline for a document and record failures on it."""
+    db = SessionLocal()
+    try:
+        pipeline = IngestionPipeline(db)
+        await pipeline.process_document(document_id)
+    except Exception as e:
+        # Update document status on error
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if document:
+            document.processing_status = f"error: {str(e)[:100]}"
+            db.commit()
+        return
+    finally:
+        db.close()
+    
+    # Records changed, so earlier analyses of this document are stale. The
+    # document is already committed, so a cache failure must not mark it failed.
+    try:
+        await get_response_cache().invalidate(f"analyze:{document_id}")
+    except Exception as e:
+        logger.warning(f"Could not invalidate analyses of {document_id}: {type(e).__name__}: {e}")
+
+
+async def _run_in_worker(document_id: UUID):
+    """Run the pipeline with HTTP and Redis pools bound to this task's loop, then release them."""
+    await open_http_client()
+    try:
+        await run_ingestion_pipeline(document_id)
+    finally:
+        await close_http_client()
+        await close_response_cache()
+
+
+@celery_app.task(name="mdia.ingest_document")
+def run_ingest(document_id: str):
+    """Celery entry point for the ingestion pipeline."""
+    logger.info(f"Ingesting document {document_id}")
+    asyncio.run(_run_in_worker(UUID(document_id)))
+
+
+@celery_app.task(name="mdia.convert_legacy")
+def convert_legacy(document_id: str, file_path: str):
+    """Celery entry point for legacy Excel conversion."""
+    logger.info(f"Converting legacy document {document_id}")
+    db = SessionLocal()
+    try:
+        LegacyConverter(db).convert(UUID(document_id), file_path)
+    finally:
+        db.close()
@@ -1,5 +1,8 @@
 """Unit tests for AI functionality."""
 
+import asyncio
+import json
+import httpx
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 from pydantic import ValidationError
@@ -8,14 +11,26 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from api.routes import ai as ai_routes
 from api.routes.ai import (
     get_llm_client,
+    get_ai_status,
+    ai_analyze_all,
+    AIAnalyzeAllRequest,
     AIChatRequest,
     AIAnalyzeRequest,
     AIStatusResponse,
     AIChatResponse,
     AIAnalyzeResponse,
 )
+from core.cache import TTLCache
+from llm.coalescing import CoalescingLLMProxy
+from llm.cache import ResponseCache, cached_generate, close_response_cache, get_response_cache
+from llm import client as llm_client
+from llm.client import LLMClient
+from llm.extractor import LLMExtractor, EXTRACTION_WINDOW_CHARS, EXTRACTION_WINDOW_OVERLAP
+from reports.cap_generator import CAPGenerator
+from services import tasks
 
 
 class TestLLMClient:
@@ -27,6 +42,34 @@ class TestLLMClient:
         client2 = get_llm_client()
         assert client1 is client2
     
+    def test_features_share_client_singleton(self):
+        """Test that extraction and CAP generation reuse the shared client by default."""
+        client = get_llm_client()
+        assert LLMExtractor().client is client
+        assert CAPGenerator().client is client
+        
+        other = LLMClient(model="test-model")
+        assert CAPGenerator(other).client is other
+    
+    def test_http_client_belongs_to_opening_loop(self):
+        """Test that the pooled HTTP client must be opened, and a stale one is closed."""
+        async def open_without_closing():
+            with pytest.raises(RuntimeError):
+                llm_client.get_http_client()
+            return await llm_client.open_http_client()
+        
+        async def reopen():
+            http = await llm_client.open_http_client()
+            assert llm_client.get_http_client() is http
+            await llm_client.close_http_client()
+            return http
+        
+        stale = asyncio.run(open_without_closing())
+        fresh = asyncio.run(reopen())
+        
+        assert fresh is not stale
+        assert stale.is_closed and fresh.is_closed
+    
     def test_client_has_model(self):
         """Test that client has model attribute."""
         llm = get_llm_client()
@@ -46,6 +89,106 @@ class TestLLMClient:
         assert callable(llm.generate)
 
 
+    def test_generate_posts_chat_completion(self):
+        """Test that generate() sends an OpenAI-style request over the pooled client."""
+        seen = {}
+        
+        def handler(request):
+            seen["auth"] = request.headers.get("Authorization")
+            seen["body"] = request.read()
+            return httpx.Response(200, json={"choices": [{"message": {"content": "pong"}}]})
+        
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+                with patch("llm.client.get_http_client", return_value=http):
+                    client = LLMClient(model="test-model")
+                    client.token = "secret"
+                    return await client.generate("ping", system_prompt="sys")
+        
+        assert asyncio.run(run()) == "pong"
+        assert seen["auth"] == "Bearer secret"
+        assert b'"model":"test-model"' in seen["body"].replace(b" ", b"")
+    
+    def test_concurrent_requests_are_bounded(self):
+        """Test that fanned-out generate calls respect LLM_MAX_CONCURRENCY."""
+        state = {"active": 0, "peak": 0}
+        
+        async def handler(request):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+        
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+                with patch("llm.client.get_http_client", return_value=http), \
+                        patch("llm.client.LLM_MAX_CONCURRENCY", 2):
+                    client = LLMClient(model="test-model")
+                    return await asyncio.gather(*[client.generate(f"p{i}") for i in range(6)])
+        
+        assert list(asyncio.run(run())) == ["ok"] * 6
+        assert state["peak"] == 2
+    
+    def test_generate_stream_yields_sse_deltas(self):
+        """Test that generate_stream() forwards content deltas from server-sent events."""
+        seen = {}
+        events = [
+            {"choices": [{"delta": {"role": "assistant"}}]},
+            {"choices": [{"delta": {"content": "# CAP"}}]},
+            {"choices": [{"delta": {"content": "\nItem 1"}}]},
+        ]
+        body = "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+        
+        def handler(request):
+            seen["body"] = request.read()
+            return httpx.Response(200, text=body, headers={"Content-Type": "text/event-stream"})
+        
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+                with patch("llm.client.get_http_client", return_value=http):
+                    client = LLMClient(model="test-model")
+                    return [chunk async for chunk in client.generate_stream("plan")]
+        
+        assert asyncio.run(run()) == ["# CAP", "\nItem 1"]
+        assert b'"stream":true' in seen["body"].replace(b" ", b"")
+    
+    def test_recent_success_skips_availability_probe(self):
+        """Test that is_available reuses a recent successful generation."""
+        calls = []
+        
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+        
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+                with patch("llm.client.get_http_client", return_value=http):
+                    client = LLMClient(model="test-model")
+                    await client.generate("ping")
+                    return await client.is_available()
+        
+        assert asyncio.run(run()) is True
+        assert len(calls) == 1
+
+
+    def test_status_probe_is_cached(self):
+        """Test that repeated status checks within the TTL probe HF once."""
+        client = get_llm_client()
+        ai_routes._status_cache.clear()
+        
+        async def run():
+            return await asyncio.gather(get_ai_status(), get_ai_status(), get_ai_status())
+        
+        try:
+            with patch.object(client, "is_available", AsyncMock(return_value=True)) as probe:
+                results = asyncio.run(run())
+            assert probe.await_count == 1
+            assert all(r.status == "connected" for r in results)
+        finally:
+            ai_routes._status_cache.clear()
+
+
 class TestAIChatRequestValidation:
     """Tests for AIChatRequest input validation."""
     
@@ -182,5 +325,378 @@ class TestResponseModels:
         assert response.analysis == "This is the analysis"
 
 
+class TestAnalyzeAll:
+    """Tests for the combined analysis endpoint."""
+    
+    def test_analyses_run_concurrently(self):
+        """Test that all analysis types are generated in parallel from one load."""
+        active = {"now": 0, "peak": 0}
+        
+        async def generate(prompt, **kwargs):
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await asyncio.sleep(0.01)
+            active["now"] -= 1
+            return prompt.split(":")[0]
+        
+        client = MagicMock(model="analyze-all-test")
+        client.generate = AsyncMock(side_effect=generate)
+        request = AIAnalyzeAllRequest(document_id="doc-concurrency-test")
+        
+        with patch("api.routes.ai.get_llm_client", return_value=client), \
+             patch("api.routes.ai._load_analysis_context", return_value=("log.txt", "- record")) as load:
+            result = asyncio.run(ai_analyze_all(request, MagicMock(headers={})))
+        
+        load.assert_called_once()
+        assert active["peak"] == 3
+        assert set(result.analyses) == {"summary", "risks", "priorities"}
+
+
+class TestResponseCache:
+    """Tests for LLM response caching."""
+    
+    def test_ttl_cache_expires_entries(self):
+        """Test that entries past their TTL are not returned."""
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("fresh", "value")
+        cache.set("stale", "value", ttl=-1)
+        assert cache.get("fresh") == "value"
+        assert cache.get("stale") is None
+    
+    def test_ttl_cache_evicts_least_recently_used(self):
+        """Test that the oldest untouched entry is evicted when full."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert "a" in cache
+        assert "b" not in cache
+    
+    def test_response_cache_keeps_per_entry_ttl_in_l1(self):
+        """Test that the ttl passed to set() governs the in-process copy too."""
+        cache = ResponseCache(ttl=300)
+        
+        with patch("core.cache.time.monotonic", return_value=1000.0):
+            asyncio.run(cache.set("short", "value", ttl=5))
+            asyncio.run(cache.set("long", "value", ttl=86400))
+        
+        with patch("core.cache.time.monotonic", return_value=1010.0):
+            assert asyncio.run(cache.get("short")) is None
+            assert asyncio.run(cache.get("long")) == "value"
+        with patch("core.cache.time.monotonic", return_value=1000.0 + 86401):
+            assert asyncio.run(cache.get("long")) is None
+    
+    def test_redis_hit_expires_from_l1_with_redis_entry(self):
+        """Test that an L2 hit is promoted to L1 for at most its remaining Redis lifetime."""
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=["from redis", 5])
+        cache = ResponseCache(ttl=300)
+        cache.redis = MagicMock()
+        cache.redis.pipeline.return_value = pipe
+        
+        with patch("core.cache.time.monotonic", return_value=1000.0):
+            assert asyncio.run(cache.get("key")) == "from redis"
+        
+        pipe.execute = AsyncMock(return_value=[None, -2])
+        with patch("core.cache.time.monotonic", return_value=1004.0):
+            assert asyncio.run(cache.get("key")) == "from redis"
+        with patch("core.cache.time.monotonic", return_value=1006.0):
+            assert asyncio.run(cache.get("key")) is None
+    
+    def test_key_depends_on_params(self):
+        """Test that differing generation params produce different keys."""
+        key1 = ResponseCache.make_key("chat", "hi", "sys", {"temperature": 0.2})
+        key2 = ResponseCache.make_key("chat", "hi", "sys", {"temperature": 0.3})
+        assert key1 != key2
+    
+    def test_cached_generate_skips_client_on_hit(self):
+        """Test that a repeated request is served without calling the model."""
+        client = MagicMock(model="test-model")
+        client.generate = AsyncMock(return_value="cached answer")
+        
+        with patch("llm.cache._response_cache", ResponseCache()):
+            first = asyncio.run(cached_generate(client, "question", "sys", namespace="chat"))
+            second = asyncio.run(cached_generate(client, "question", "sys", namespace="chat"))
+        
+        assert first == ("cached answer", False)
+        assert second == ("cached answer", True)
+        client.generate.assert_awaited_once()
+    
+    def test_cap_regeneration_is_cached(self):
+        """Test that regenerating a CAP for unchanged records reuses the LLM output."""
+        generator = CAPGenerator()
+        plan = "# Corrective Action Plan\n" + "Replace the pump seal. " * 10
+        document = MagicMock(id="doc-cap-cache", filename="log.txt")
+        record = MagicMock(
+            component="Pump", system=None, failure_type=None, maint_action="Reseal",
+            priority="high", status="open", start_date=None, end_date=None,
+            cost_estimate=None, summary_notes=None
+        )
+        
+        with patch("llm.cache._response_cache", ResponseCache()), \
+                patch.object(generator.client, "generate", AsyncMock(return_value=plan)) as generate:
+            first = asyncio.run(generator.generate(document, [record]))
+            second = asyncio.run(generator.generate(document, [record]))
+        
+        assert first == second == plan
+        generate.assert_awaited_once()
+    
+    def test_cap_stream_is_cached_and_falls_back_to_template(self):
+        """Test that a streamed CAP is cached, and a failed stream yields the template CAP."""
+        generator = CAPGenerator()
+        plan = "# Corrective Action Plan\n" + "Replace the pump seal. " * 10
+        document = MagicMock(id="doc-cap-stream", filename="log.txt")
+        record = MagicMock(
+            component="Pump", system=None, failure_type=None, maint_action="Reseal",
+            priority="high", status="open", start_date=None, end_date=None,
+            cost_estimate=None, summary_notes=None
+        )
+        calls = []
+        
+        async def stream(**kwargs):
+            calls.append(kwargs)
+            for i in range(0, len(plan), 20):
+                yield plan[i:i + 20]
+        
+        async def failing_stream(**kwargs):
+            raise httpx.ConnectError("down")
+            yield
+        
+        async def collect():
+            return "".join([chunk async for chunk in generator.generate_stream(document, [record])])
+        
+        with patch("llm.cache._response_cache", ResponseCache()):
+            with patch.object(generator.client, "generate_stream", stream):
+                first = asyncio.run(collect())
+                second = asyncio.run(collect())
+            with patch.object(generator.client, "generate_stream", failing_stream):
+                document.id = "doc-cap-stream-2"
+                fallback = asyncio.run(collect())
+        
+        assert first == second == plan
+        assert len(calls) == 1
+        assert fallback.startswith("# Corrective Action Plan\n\n**Document:** log.txt")
+    
+    def test_cap_batch_generates_plans_concurrently(self):
+        """Test that batch CAP generation runs documents concurrently and keys plans by id."""
+        generator = CAPGenerator()
+        state = {"active": 0, "peak": 0}
+        documents = [MagicMock(id=f"doc-batch-{i}", filename=f"log{i}.txt") for i in range(3)]
+        record = MagicMock(
+            component="Pump", system=None, failure_type=None, maint_action="Reseal",
+            priority="high", status="open", start_date=None, end_date=None,
+            cost_estimate=None, summary_notes=None
+        )
+        
+        async def generate(prompt, **kwargs):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return "# Corrective Action Plan\n" + "Replace the pump seal. " * 10
+        
+        with patch("llm.cache._response_cache", ResponseCache()), \
+                patch.object(generator.client, "generate", generate):
+            plans = asyncio.run(generator.generate_batch([(d, [record]) for d in documents]))
+        
+        assert list(plans) == [d.id for d in documents]
+        assert state["peak"] == 3
+    
+    def test_invalidate_drops_namespace(self):
+        """Test that invalidating a document namespace forces regeneration."""
+        client = MagicMock(model="test-model")
+        client.generate = AsyncMock(return_value="analysis")
+        cache = ResponseCache()
+        
+        with patch("llm.cache._response_cache", cache):
+            asyncio.run(cached_generate(client, "p", namespace="analyze:doc-1"))
+            asyncio.run(cache.invalidate("analyze:doc-1"))
+            _, hit = asyncio.run(cached_generate(client, "p", namespace="analyze:doc-1"))
+        
+        assert hit is False
+        assert client.generate.await_count == 2
+    
+    def test_close_releases_redis_pool_for_next_loop(self):
+        """Test that closing the cache closes its Redis pool and the next caller gets a new one."""
+        cache = ResponseCache()
+        cache.redis = MagicMock(aclose=AsyncMock())
+        
+        with patch("llm.cache._response_cache", cache):
+            asyncio.run(close_response_cache())
+            fresh = get_response_cache()
+        
+        cache.redis.aclose.assert_awaited_once()
+        assert fresh is not cache
+    
+    def test_ingest_task_survives_cache_failure(self):
+        """Test that a failed invalidation does not mark an ingested document as failed."""
+        db = MagicMock()
+        cache = ResponseCache()
+        cache.invalidate = AsyncMock(side_effect=RuntimeError("Event loop is closed"))
+        
+        with patch.object(tasks, "SessionLocal", return_value=db), \
+                patch.object(tasks, "IngestionPipeline") as pipeline, \
+                patch("llm.cache._response_cache", cache):
+            pipeline.return_value.process_document = AsyncMock()
+            asyncio.run(tasks.run_ingestion_pipeline("doc-1"))
+        
+        cache.invalidate.assert_awaited_once_with("analyze:doc-1")
+        db.query.assert_not_called()
+        db.close.assert_called_once()
+
+
+class TestCoalescingLLMProxy:
+    """Tests for chat request coalescing."""
+    
+    def test_identical_concurrent_requests_share_one_call(self):
+        """Test that identical in-flight requests share a call and distinct ones don't wait."""
+        client = MagicMock(model="test-model")
+        
+        async def generate(prompt, **kwargs):
+            await asyncio.sleep(0.01)
+            return prompt.upper()
+        client.generate = AsyncMock(side_effect=generate)
+        
+        async def run():
+            proxy = CoalescingLLMProxy(client)
+            results = await asyncio.gather(
+                proxy.generate("first", system_prompt="sys", temperature=0.3),
+                proxy.generate("second", system_prompt="sys", temperature=0.3),
+                proxy.generate("first", system_prompt="sys", temperature=0.3),
+                proxy.generate("first", system_prompt="sys", temperature=0.7),
+            )
+            # Finished calls are not reused
+            again = await proxy.generate("first", system_prompt="sys", temperature=0.3)
+            return results, again, proxy._inflight
+        
+        results, again, inflight = asyncio.run(run())
+        
+        assert results == ["FIRST", "SECOND", "FIRST", "FIRST"]
+        assert again == "FIRST"
+        assert client.generate.await_count == 4
+        assert inflight == {}
+    
+    def test_failure_reaches_every_waiter(self):
+        """Test that an error from the shared call is raised to each caller."""
+        client = MagicMock(model="test-model")
+        client.generate = AsyncMock(side_effect=RuntimeError("down"))
+        
+        async def run():
+            proxy = CoalescingLLMProxy(client)
+            return await asyncio.gather(
+                proxy.generate("hello"), proxy.generate("hello"), return_exceptions=True
+            )
+        
+        results = asyncio.run(run())
+        
+        assert [type(r) for r in results] == [RuntimeError, RuntimeError]
+        client.generate.assert_awaited_once()
+
+
+class TestLLMExtractor:
+    """Tests for windowed LLM record extraction."""
+    
+    def test_long_documents_are_split_and_merged(self):
+        """Test that every window is extracted and overlapping duplicates dropped."""
+        extractor = LLMExtractor()
+        windows = []
+        
+        async def extract_json(prompt, system_prompt=None):
+            windows.append(prompt)
+            return [
+                {"component": "Pump-1", "maint_action": "Replace seal"},
+                {"component": f"Valve-{len(windows)}", "maint_action": "Inspect"},
+            ]
+        
+        with patch.object(extractor.client, "extract_json", AsyncMock(side_effect=extract_json)):
+            records = asyncio.run(extractor._llm_extract("x" * 13000))
+        
+        assert len(windows) == 3
+        assert [r["component"] for r in records] == ["Pump-1", "Valve-1", "Valve-2", "Valve-3"]
+    
+    @pytest.mark.parametrize("length,calls", [
+        (EXTRACTION_WINDOW_CHARS, 1),
+        (EXTRACTION_WINDOW_CHARS - EXTRACTION_WINDOW_OVERLAP + 100, 1),
+        (EXTRACTION_WINDOW_CHARS + 1, 2),
+        (0, 0),
+    ])
+    def test_window_count_at_boundaries(self, length, calls):
+        """Test that no window lies entirely inside the previous one's overlap."""
+        extractor = LLMExtractor()
+        text = "x" * length
+        windows = []
+        
+        async def extract_json(prompt, system_prompt=None):
+            windows.append(prompt)
+            return []
+        
+        with patch.object(extractor.client, "extract_json", AsyncMock(side_effect=extract_json)):
+            asyncio.run(extractor._llm_extract(text))
+        
+        assert len(windows) == calls
+    
+    def test_empty_llm_answer_skips_regex_fallback(self):
+        """Test that only a failed LLM extraction falls back to the regex scan."""
+        extractor = LLMExtractor()
+        text = "Component: Pump-1\nAction: Replace seal\n"
+        
+        with patch.object(extractor.client, "extract_json", AsyncMock(return_value=[])):
+            assert asyncio.run(extractor.extract_records(text)) == []
+        
+        with patch.object(extractor.client, "extract_json", AsyncMock(return_value=None)):
+            records = asyncio.run(extractor.extract_records(text))
+        assert records and records[0]["maint_action"] == "Replace seal"
+    
+    def test_regex_fallback_caps_records_and_shares_first_priority(self):
+        """Test that the regex fallback builds at most ten records from the text."""
+        extractor = LLMExtractor()
+        text = "Priority: High\nCost: $1,250.00\n" + "".join(
+            f"Equipment: Pump{i}\nRepair: reseal {i}\n" for i in range(15)
+        )
+        
+        records = extractor._regex_extract(text)
+        
+        assert len(records) == 10
+        assert records[0]["component"].startswith("Pump0")
+        assert all(r["priority"] == "high" and r["cost_estimate"] == 1250.0 for r in records)
+    
+    def test_regex_fallback_scans_only_leading_text(self):
+        """Test that matches beyond REGEX_SCAN_CHARS are ignored."""
+        extractor = LLMExtractor()
+        text = "Equipment: Pump1\n" + " " * 100 + "Equipment: Valve2\nPriority: High\n"
+        
+        with patch("llm.extractor.REGEX_SCAN_CHARS", 50):
+            records = extractor._regex_extract(text)
+        
+        assert [r["component"].strip() for r in records] == ["Pump1"]
+        assert records[0]["priority"] is None
+    
+    def test_parse_date_accepts_supported_layouts(self):
+        """Test date parsing across US, day-first, year-first and dashed layouts."""
+        extractor = LLMExtractor()
+        
+        assert extractor._parse_date("2024-01-05") == "2024-01-05"
+        assert extractor._parse_date("03/04/2024") == "2024-03-04"
+        assert extractor._parse_date("25/12/2024") == "2024-12-25"
+        assert extractor._parse_date("2024/3/4") == "2024-03-04"
+        assert extractor._parse_date("05-06-2024") == "2024-05-06"
+        assert extractor._parse_date("31/02/2024") is None
+        assert extractor._parse_date("null") is None
+    
+    def test_parse_number_accepts_grouped_digits_only(self):
+        """Test cost parsing keeps underscore grouping but rejects inf and nan."""
+        extractor = LLMExtractor()
+        
+        assert extractor._parse_number("$1,250.50") == 1250.5
+        assert extractor._parse_number("1_000") == 1000.0
+        assert extractor._parse_number("1.5e3") == 1500.0
+        assert extractor._parse_number(".5") == 0.5
+        assert extractor._parse_number("1__000") is None
+        assert extractor._parse_number("inf") is None
+        assert extractor._parse_number("nan") is None
+        assert extractor._parse_number("TBD") is None
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
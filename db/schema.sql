@@ -10,10 +10,12 @@ CREATE TABLE documents (
     filename VARCHAR(255) NOT NULL,
     file_type VARCHAR(50) NOT NULL,
     file_size INTEGER NOT NULL,
+    content_sha256 CHAR(64) UNIQUE,
     upload_date TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     processed BOOLEAN DEFAULT FALSE,
     processing_status VARCHAR(50) DEFAULT 'pending',
     raw_text TEXT,
+    column_mappings JSONB,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
@@ -69,12 +71,14 @@ CREATE TABLE status_updates (
 -- Indexes for performance
 CREATE INDEX idx_documents_processed ON documents(processed);
 CREATE INDEX idx_documents_upload_date ON documents(upload_date);
-CREATE INDEX idx_records_document_id ON extracted_records(document_id);
+CREATE INDEX idx_records_document_created ON extracted_records(document_id, created_at DESC);
 CREATE INDEX idx_records_status ON extracted_records(status);
 CREATE INDEX idx_records_priority ON extracted_records(priority);
+CREATE INDEX idx_records_document_status ON extracted_records(document_id, status);
+CREATE INDEX idx_records_document_priority ON extracted_records(document_id, priority);
 CREATE INDEX idx_anomalies_document_id ON anomalies(document_id);
 CREATE INDEX idx_anomalies_resolved ON anomalies(resolved);
-CREATE INDEX idx_status_updates_record_id ON status_updates(record_id);
+CREATE INDEX idx_status_updates_record_created ON status_updates(record_id, created_at DESC);
 
 -- Trigger to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -90,14 +90,29 @@ export async function deleteDocument(id: string): Promise<{ message: string; id:
 }
 
 // Legacy conversion
+const LEGACY_POLL_INTERVAL_MS = 1000;
+// Give up on a queued conversion after this long (e.g. the worker was lost)
+const LEGACY_POLL_TIMEOUT_MS = 10 * 60 * 1000;
+
 export async function convertLegacyExcel(file: File): Promise<LegacyConversionResult> {
     const formData = new FormData();
     formData.append('file', file);
 
-    const response = await fetch(`${API_BASE}/legacy/convert`, {
+    let response = await fetch(`${API_BASE}/legacy/convert`, {
         method: 'POST',
         body: formData,
     });
+
+    // 202 means the conversion was queued; poll until the worker finishes
+    const deadline = Date.now() + LEGACY_POLL_TIMEOUT_MS;
+    while (response.status === 202) {
+        const { result_url } = await response.json();
+        if (Date.now() >= deadline) {
+            throw new ApiError('Legacy conversion timed out waiting for the worker', 408);
+        }
+        await new Promise((resolve) => setTimeout(resolve, LEGACY_POLL_INTERVAL_MS));
+        response = await fetch(`${API_BASE}${result_url}`);
+    }
     return handleResponse(response);
 }
 
@@ -154,6 +169,34 @@ export async function getCAPReport(documentId: string): Promise<CAPReport> {
     return handleResponse(response);
 }
 
+export async function streamCAPReport(
+    documentId: string,
+    onChunk: (markdown: string) => void
+): Promise<CAPReport> {
+    const response = await fetch(`${API_BASE}/report/cap/stream?document_id=${documentId}`);
+    if (!response.ok || !response.body) {
+        return handleResponse(response);
+    }
+
+    // Hand the accumulated markdown to the caller as each chunk arrives
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let markdown = '';
+    for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        markdown += decoder.decode(value, { stream: true });
+        onChunk(markdown);
+    }
+    markdown += decoder.decode();
+
+    return {
+        document_id: documentId,
+        generated_at: new Date().toISOString(),
+        markdown_content: markdown,
+    };
+}
+
 // AI Functions
 export async function getAIStatus(): Promise<AIStatus> {
     const response = await fetch(`${API_BASE}/ai/status`);
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useParams, Link } from 'react-router-dom';
-import { getCAPReport } from '../api/client';
+import { streamCAPReport } from '../api/client';
 import type { CAPReport as CAPReportType } from '../api/types';
 
 export default function CorrectiveActionPlan() {
@@ -16,7 +16,12 @@ export default function CorrectiveActionPlan() {
 
             try {
                 setLoading(true);
-                const data = await getCAPReport(id);
+                // Render the plan progressively as it streams in
+                const generatedAt = new Date().toISOString();
+                const data = await streamCAPReport(id, (markdown) => {
+                    setReport({ document_id: id, generated_at: generatedAt, markdown_content: markdown });
+                    setLoading(false);
+                });
                 setReport(data);
             } catch (err) {
                 setError(err instanceof Error ? err.message : 'Failed to generate CAP');